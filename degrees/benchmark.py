@@ -0,0 +1,217 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+
+import degrees
+
+# Ways of loading the data that can be benchmarked. All but "cached" keep
+# shortest_path from answering out of the BFS tree cache
+MODES = {
+    "dict": {"trees": False},
+    "compact": {"compact": True, "trees": False},
+    "snapshot": {"snapshot": True, "trees": False},
+    "components": {"snapshot": True, "components": True, "trees": False},
+    "cached": {"snapshot": True}
+}
+
+# Largest cast a generated movie can have
+MAX_CAST = 500
+
+FIRST_NAMES = (
+    "Ada", "Alan", "Ana", "Ben", "Carl", "Clara", "Dan", "Emma", "Eva",
+    "Grace", "Hugo", "Ivan", "Jane", "Kevin", "Lea", "Liam", "Maya", "Noah",
+    "Olga", "Omar", "Paul", "Rosa", "Sam", "Tom", "Uma", "Yuki", "Zoe"
+)
+LAST_NAMES = (
+    "Bacon", "Chen", "Cruise", "Diaz", "Evans", "Field", "Garcia", "Hanks",
+    "Ito", "Jones", "Khan", "Lopez", "Martin", "Nguyen", "Okafor", "Patel",
+    "Quinn", "Rossi", "Silva", "Smith", "Tanaka", "Urban", "Watson", "Young"
+)
+
+
+def generate(directory, edges, seed):
+    """
+    Writes people.csv, movies.csv and stars.csv with about `edges` star
+    rows to `directory`.
+
+    Cast sizes follow a Pareto (power-law) distribution, and people are
+    picked with a skew so that a few of them appear in many movies, like
+    prolific actors do.
+    """
+    rng = random.Random(seed)
+    population = max(2, edges // 3)
+    os.makedirs(directory, exist_ok=True)
+
+    with open(os.path.join(directory, "people.csv"), "w", newline="",
+              encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for person in range(population):
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            if rng.random() < 0.9:
+                # Keep most names unique, as real ones mostly are
+                name += f" {person}"
+            writer.writerow([person + 1, name, rng.randint(1900, 2010)])
+
+    with open(os.path.join(directory, "movies.csv"), "w", newline="",
+              encoding="utf-8") as movies_file, \
+            open(os.path.join(directory, "stars.csv"), "w", newline="",
+                 encoding="utf-8") as stars_file:
+        movies = csv.writer(movies_file)
+        stars = csv.writer(stars_file)
+        movies.writerow(["id", "title", "year"])
+        stars.writerow(["person_id", "movie_id"])
+        movie = written = 0
+        while written < edges:
+            movie += 1
+            movies.writerow([movie, f"Movie {movie}", rng.randint(1920, 2020)])
+            cast = min(MAX_CAST, int(rng.paretovariate(1.3)) + 1,
+                       edges - written)
+            for _ in range(cast):
+                person = int(population * rng.random() ** 2)
+                stars.writerow([person + 1, movie])
+            written += cast
+
+
+def queries(directory, count, seed):
+    """
+    Returns `count` (source, target) person_id pairs drawn with `seed`.
+    """
+    with open(os.path.join(directory, "people.csv"), encoding="utf-8") as f:
+        population = sum(1 for _ in f) - 1
+    rng = random.Random(seed)
+    return [
+        (str(rng.randrange(population) + 1), str(rng.randrange(population) + 1))
+        for _ in range(count)
+    ]
+
+
+def run(directory, mode, count, seed):
+    """
+    Times loading `directory` in `mode` and the lookups and searches of a
+    fixed query set. Meant to run in a fresh process so the peak RSS it
+    reports belongs to this mode alone.
+    """
+    pairs = queries(directory, count, seed)
+
+    started = time.perf_counter()
+    degrees.load_data(directory, **MODES[mode])
+    load = time.perf_counter() - started
+
+    neighbors = _timed(degrees.neighbors_for_person,
+                       [(source,) for source, _ in pairs])
+    paths = _timed(degrees.shortest_path, pairs)
+    return {
+        "mode": mode,
+        "load_s": round(load, 6),
+        "neighbors_for_person": neighbors,
+        "shortest_path": paths,
+        "peak_rss_kb": _peak_rss_kb()
+    }
+
+
+def snapshot(directory):
+    """
+    Builds or refreshes the snapshot of `directory`. Meant to run in a
+    process of its own beforehand, so that `run` in a snapshot mode times
+    and measures loading the snapshot, not parsing the CSV files.
+    """
+    degrees.load_data(directory, snapshot=True)
+
+
+def benchmark(edges, modes, count, seed, workdir):
+    """
+    Yields one result per (edge count, mode), generating data as needed.
+    """
+    context = multiprocessing.get_context("spawn")
+    for size in edges:
+        directory = os.path.join(workdir, f"edges-{size}-seed-{seed}")
+        if not os.path.exists(os.path.join(directory, "stars.csv")):
+            generate(directory, size, seed)
+        if any(MODES[mode].get("snapshot") for mode in modes):
+            with context.Pool(1) as pool:
+                pool.apply(snapshot, (directory,))
+        for mode in modes:
+            with context.Pool(1) as pool:
+                result = pool.apply(run, (directory, mode, count, seed))
+            result.update({"edges": size, "seed": seed, "queries": count})
+            yield result
+
+
+def _timed(function, calls):
+    """
+    Calls `function` with each argument tuple in `calls` and returns
+    throughput and latency percentiles.
+    """
+    latencies = []
+    started = time.perf_counter()
+    for args in calls:
+        call_started = time.perf_counter()
+        function(*args)
+        latencies.append(time.perf_counter() - call_started)
+    total = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "calls": len(calls),
+        "total_s": round(total, 6),
+        "per_s": round(len(calls) / total, 1) if total else None,
+        "p50_ms": _percentile_ms(latencies, 0.50),
+        "p90_ms": _percentile_ms(latencies, 0.90),
+        "p99_ms": _percentile_ms(latencies, 0.99),
+        "max_ms": _percentile_ms(latencies, 1.0)
+    }
+
+
+def _percentile_ms(values, fraction):
+    if not values:
+        return None
+    value = values[min(len(values) - 1, int(fraction * len(values)))]
+    return round(value * 1000, 3)
+
+
+def _peak_rss_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark degrees on synthetic power-law data."
+    )
+    parser.add_argument("--edges", type=int, nargs="+",
+                        default=[10000, 100000, 1000000],
+                        help="star rows to generate, one run per value")
+    parser.add_argument("--modes", nargs="+", choices=sorted(MODES),
+                        default=sorted(MODES))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workdir", default=os.path.join(
+        tempfile.gettempdir(), "degrees-benchmark"
+    ), help="where generated data is kept between runs")
+    parser.add_argument("--output", help="write JSON lines here, not stdout")
+    args = parser.parse_args()
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    header = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count()
+    }
+    with output:
+        for result in benchmark(args.edges, args.modes, args.queries,
+                                args.seed, args.workdir):
+            result.update(header)
+            print(json.dumps(result), file=output, flush=True)
+
+
+if __name__ == "__main__":
+    main()
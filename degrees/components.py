@@ -0,0 +1,127 @@
+import array
+
+
+class ComponentIndex():
+    """
+    Union-find over people, merging everyone who starred in the same movie,
+    so whether two people are connected at all is answered in near O(1).
+
+    With `size` (the number of people in an integer-indexed graph) the
+    forest is kept in flat arrays, otherwise in dicts keyed by person_id.
+
+    Union-find cannot split a component, so once a star edge is removed
+    the index is marked not `exact`: `connected` may then report people
+    as connected when they no longer are (never the other way round),
+    and the statistics are out of date until the index is rebuilt.
+    """
+
+    def __init__(self, people, casts, size=None):
+        if size is None:
+            self.parent = {person: person for person in people}
+            self.sizes = dict.fromkeys(self.parent, 1)
+        else:
+            self.parent = array.array("i", range(size))
+            self.sizes = array.array("i", [1]) * size
+        self.count = len(self.parent)
+        self.exact = True
+        self.removed = set()
+
+        for cast in casts:
+            cast = iter(cast)
+            first = next(cast, None)
+            for person in cast:
+                self.union(first, person)
+
+    def find(self, person):
+        """
+        Returns the representative of the component of `person`.
+        """
+        parent = self.parent
+        root = person
+        while parent[root] != root:
+            root = parent[root]
+        # Path compression
+        while parent[person] != root:
+            parent[person], person = root, parent[person]
+        return root
+
+    def union(self, a, b):
+        """
+        Merges the components of `a` and `b`.
+        """
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.sizes[a] < self.sizes[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.sizes[a] += self.sizes[b]
+        self.count -= 1
+
+    def add(self, person):
+        """
+        Adds `person` as a component of their own.
+        """
+        if person in self.removed:
+            # Still linked into their old tree, which now overstates it
+            self.removed.discard(person)
+            self.sizes[self.find(person)] += 1
+            self.exact = False
+            return
+        if isinstance(self.parent, dict):
+            self.parent[person] = person
+            self.sizes[person] = 1
+        else:
+            self.parent.append(person)
+            self.sizes.append(1)
+        self.count += 1
+
+    def discard(self, person):
+        """
+        Leaves `person`, who must no longer star in anything, out of the
+        statistics.
+        """
+        if person in self.removed:
+            return
+        self.removed.add(person)
+        root = self.find(person)
+        self.sizes[root] -= 1
+        if self.sizes[root] == 0:
+            self.count -= 1
+
+    def connected(self, a, b):
+        """
+        Returns whether some path of movies connects `a` and `b`.
+        """
+        return self.find(a) == self.find(b)
+
+    def component_size(self, person):
+        """
+        Returns the number of people in the component of `person`.
+        """
+        return self.sizes[self.find(person)]
+
+    def component_sizes(self):
+        """
+        Returns the size of every component, largest first.
+        """
+        if isinstance(self.parent, dict):
+            roots = (person for person, parent in self.parent.items()
+                     if person == parent)
+        else:
+            roots = (person for person, parent in enumerate(self.parent)
+                     if person == parent)
+        sizes = (self.sizes[root] for root in roots)
+        return sorted((size for size in sizes if size), reverse=True)
+
+    def stats(self):
+        """
+        Returns the number of components and the sizes of the largest one
+        and of the people left on their own.
+        """
+        sizes = self.component_sizes()
+        return {
+            "components": self.count,
+            "largest": sizes[0] if sizes else 0,
+            "singletons": sum(1 for size in sizes if size == 1)
+        }
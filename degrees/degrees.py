@@ -1,7 +1,18 @@
 
+import argparse
 import csv
+import itertools
+import json
+import multiprocessing
 import sys
 
+from components import ComponentIndex
+from graph import MoviesView, NamesView, PeopleView, load_graph
+from landmarks import load_landmarks
+from nameindex import Column, NameIndex
+from search import (
+    BFSTree, TreeCache, all_shortest_paths, bidirectional_search
+)
 from util import Node, StackFrontier, QueueFrontier
 
 # Maps names to a set of corresponding person_ids
@@ -13,10 +24,88 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Compact StarGraph behind the three mappings above, if loaded with compact=True
+graph = None
 
-def load_data(directory):
+# LandmarkIndex over `graph`, if loaded with landmarks=k
+landmark_index = None
+
+# ComponentIndex over `people`, if loaded with components=True
+component_index = None
+
+# NameIndex over `names`, if loaded with index_names=True
+name_index = None
+
+# BFS parent trees of sources that shortest_path is asked about repeatedly
+tree_cache = TreeCache()
+
+
+def load_data(directory, compact=False, snapshot=False, landmarks=0,
+              components=False, index_names=False, trees=True):
     """
     Load data from CSV files into memory.
+
+    With `compact`, the data is held in an integer-indexed StarGraph and
+    `names`, `people` and `movies` become read-only views over it.
+    With `snapshot` (which implies `compact`), the graph is memory-mapped
+    from a binary snapshot next to `directory`, which is (re)written
+    whenever it is missing or older than the CSV files.
+    With `landmarks` set to k (which implies `compact`), BFS distances
+    from k landmark people are loaded from, or saved to,
+    `<directory>.landmarks` to bound and prune searches.
+    With `components`, a union-find index of connected components is
+    built so that people who are not connected are told apart at once.
+    With `index_names`, a NameIndex is built for name completion and
+    "did you mean" suggestions.
+    With `trees` false, shortest_path never builds BFS trees for the
+    sources it is asked about repeatedly.
+    """
+    global graph, names, people, movies
+    global landmark_index, component_index, name_index
+    tree_cache.clear()
+    tree_cache.enabled = trees
+    landmark_index = component_index = name_index = None
+    if compact or snapshot or landmarks:
+        graph = load_graph(directory, snapshot=snapshot)
+        names = NamesView(graph)
+        people = PeopleView(graph)
+        movies = MoviesView(graph)
+        if landmarks:
+            landmark_index = load_landmarks(graph, directory, landmarks)
+    else:
+        if graph is not None:
+            graph = None
+            names, people, movies = {}, {}, {}
+        _load_csv(directory)
+
+    if components:
+        component_index = _build_components()
+    if index_names:
+        name_index = _build_name_index()
+
+
+def _build_components():
+    """
+    Returns a ComponentIndex over the people and movies loaded now.
+    """
+    if graph is None:
+        return ComponentIndex(
+            people, (movie["stars"] for movie in movies.values())
+        )
+    index = ComponentIndex(
+        None, (graph.stars_of(m) for m in graph.movies()),
+        len(graph.person_ids)
+    )
+    if graph.overlay is not None:
+        for person in graph.overlay.removed_people:
+            index.discard(person)
+    return index
+
+
+def _load_csv(directory):
+    """
+    Load the CSV files in `directory` into the `names`, `people` and
+    `movies` dictionaries.
     """
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
@@ -54,21 +143,44 @@ def load_data(directory):
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(
+        description="Find the degrees of separation between two people."
+    )
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument(
+        "--batch", metavar="FILE",
+        help="answer tab-separated source/target lines from FILE "
+             "('-' for stdin) as JSON lines instead of prompting"
+    )
+    parser.add_argument(
+        "--processes", type=int, default=None,
+        help="worker processes for --batch (default: one per core)"
+    )
+    args = parser.parse_args()
+    directory = args.directory
+
+    if args.batch is not None:
+        queries = sys.stdin if args.batch == "-" else open(
+            args.batch, encoding="utf-8"
+        )
+        with queries:
+            for line in answer_batch(directory, queries, args.processes):
+                print(line, flush=True)
+        return
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    load_data(directory, snapshot=True, index_names=True)
     print("Data loaded.")
 
-    source = person_id_for_name(input("Name: "))
+    name = input("Name: ")
+    source = person_id_for_name(name)
     if source is None:
-        sys.exit("Person not found.")
-    target = person_id_for_name(input("Name: "))
+        sys.exit(_not_found(name))
+    name = input("Name: ")
+    target = person_id_for_name(name)
     if target is None:
-        sys.exit("Person not found.")
+        sys.exit(_not_found(name))
 
     path = shortest_path(source, target)
 
@@ -84,6 +196,95 @@ def main():
             movie = movies[path[i + 1][0]]["title"]
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
+
+def _not_found(name):
+    """
+    Returns the message for an unknown name, with suggestions if any.
+    """
+    suggestions = [
+        f"{person['name']} ({person['birth'] or 'unknown'})"
+        for person in suggest_names(name, 5)
+    ]
+    if not suggestions:
+        return "Person not found."
+    return "Person not found. Did you mean: " + ", ".join(suggestions) + "?"
+
+
+def answer_batch(directory, lines, processes=None):
+    """
+    Yields one JSON line per query in `lines`, in input order.
+
+    Each query line holds a source and a target separated by a tab, each
+    either a person_id or an unambiguous name. The graph is loaded once
+    through its memory-mapped snapshot; every worker process maps the
+    same file, so they all share one read-only copy of it.
+    """
+    queries = (line.rstrip("\r\n") for line in lines)
+    queries = (query for query in queries if query.strip())
+
+    # Build or refresh the snapshot once before any worker maps it
+    load_data(directory, snapshot=True, index_names=True)
+    if processes == 1:
+        yield from map(_answer_query, queries)
+        return
+
+    with multiprocessing.Pool(
+        processes, initializer=init_worker, initargs=(directory,)
+    ) as pool:
+        yield from pool.imap(_answer_query, queries, chunksize=64)
+
+
+def init_worker(directory):
+    """
+    Maps the graph snapshot into a worker process.
+    """
+    load_data(directory, snapshot=True, index_names=True)
+
+
+def _answer_query(query):
+    """
+    Answers one tab-separated batch query as a JSON line.
+    """
+    fields = query.split("\t")
+    if len(fields) != 2:
+        return json.dumps({"query": query, "error": "expected two fields"})
+    source, target = (field.strip() for field in fields)
+    return json.dumps(answer(source, target))
+
+
+def answer(source, target):
+    """
+    Answers a query between two person_ids or unambiguous names with a
+    dictionary of source, target, degrees and path, or of source, target,
+    error and (given a name index) suggestions if a name is not known.
+    """
+    result = {"source": source, "target": target}
+    try:
+        path = shortest_path(_resolve(source), _resolve(target))
+    except LookupError as e:
+        result["error"] = e.args[0]
+        if name_index is not None:
+            result["suggestions"] = suggest_names(e.args[1], 5)
+        return result
+    result["degrees"] = None if path is None else len(path)
+    result["path"] = path
+    return result
+
+
+def _resolve(person):
+    """
+    Returns the person_id for a person_id or an unambiguous name.
+    """
+    if person in people:
+        return person
+    person_ids = names.get(person.lower(), set())
+    if len(person_ids) == 1:
+        return next(iter(person_ids))
+    if person_ids:
+        raise LookupError(f"ambiguous name: {person}", person)
+    raise LookupError(f"person not found: {person}", person)
+
+
 def shortest_path(source, target):
     """
     Returns the shortest list of (movie_id, person_id) pairs
@@ -91,46 +292,185 @@ def shortest_path(source, target):
 
     If no possible path, returns None.
     """
-    if source == target :
+    if source == target:
         return None
+    if graph is None:
+        neighbors, size = neighbors_for_person, None
+    else:
+        source, target = graph.person_index(source), graph.person_index(target)
+        neighbors, size = graph.neighbors, len(graph.person_ids)
+
+    # People in different components are never connected
+    if component_index is not None and not component_index.connected(
+            source, target):
+        return None
+
+    # Landmarks can prove two people are not connected without a search
+    lower_bound = limit = None
+    if landmark_index is not None:
+        lower, limit = landmark_index.bounds(source, target)
+        if lower is None:
+            return None
+        lower_bound = landmark_index.lower_bound
+
+    # Answer from a cached BFS tree, building one once the searches from
+    # this source have cost as much as the tree would
+    tree = tree_cache.get(source)
+    if tree is None and tree_cache.wants(source, _tree_cost(source)):
+        tree = BFSTree(source, neighbors, size)
+        tree_cache.put(tree)
+    if tree is not None:
+        path = tree.path_to(target)
+    else:
+        expanded = 0
+
+        def counted(person):
+            nonlocal expanded
+            expanded += 1
+            return neighbors(person)
+
+        path = bidirectional_search(
+            source, target, counted, lower_bound, limit
+        )
+        tree_cache.record(source, expanded)
 
-    class Node():
-        def __init__(self, _id, parent = None, path = []):
-            self._id = _id
-            self.parent = parent
-            self.path = path
-
-    starting_node = Node(source)
-    visited = []
-    queue = [starting_node]
-    shortest_path = []
-
-
-    while queue:
-        for neighbor in neighbors_for_person(queue[0]._id):
-            if neighbor[1] == target:
-                if (len(queue[0].path) + 1) < len(shortest_path) and len(shortest_path) > 0:
-                    shortest_path = [el for el in queue[0].path]
-                    shortest_path.append(neighbor)
-                elif len(shortest_path) == 0:
-                    shortest_path = [el for el in queue[0].path]
-                    shortest_path.append(neighbor)
-                else:
-                    continue
-            # Neighbor already visited skip
-            if neighbor[1] in visited or neighbor[1] == queue[0]._id:
-                continue
-            curr_path = [el for el in queue[0].path]
-            curr_path.append(neighbor)
-            neighbor_node = Node(neighbor[1], queue[0], curr_path)
-            # Neighbor not visited add to queue
-            queue.append(neighbor_node)
-        # Add the visited element of the queue
-        visited.append(queue[0]._id)
-        # Remove it from the queue
-        queue.pop(0)
-
-    return shortest_path if len(shortest_path) > 0 else None
+    if path is None or graph is None:
+        return path
+    return [(graph.movie_ids[m], graph.person_ids[p]) for m, p in path]
+
+
+def _tree_cost(source):
+    """
+    Returns the number of people a BFSTree from `source` would expand:
+    everyone in its component if components are indexed, else everyone.
+    """
+    if component_index is not None:
+        return component_index.component_size(source)
+    return len(people) if graph is None else len(graph.person_ids)
+
+
+def shortest_paths(source, target, limit=None):
+    """
+    Yields every shortest list of (movie_id, person_id) pairs that
+    connect the source to the target, lazily and at most `limit` of them.
+
+    Yields nothing if there is no possible path.
+    """
+    if graph is None:
+        neighbors = neighbors_for_person
+    else:
+        source, target = graph.person_index(source), graph.person_index(target)
+        neighbors = graph.neighbors
+    if component_index is not None and not component_index.connected(
+            source, target):
+        return
+
+    for path in all_shortest_paths(source, target, neighbors, limit):
+        if graph is not None:
+            path = [(graph.movie_ids[m], graph.person_ids[p]) for m, p in path]
+        yield path
+
+
+def separation_bounds(source, target):
+    """
+    Returns (lower, upper) bounds on the degrees of separation between
+    two person_ids from the landmark index, without searching.
+
+    Both bounds are None if the people are known not to be connected;
+    `upper` alone is None if no landmark reaches them.
+    """
+    if landmark_index is None:
+        raise ValueError("no landmark index, use load_data(..., landmarks=k)")
+    return landmark_index.bounds(
+        graph.person_index(source), graph.person_index(target)
+    )
+
+
+def graph_statistics():
+    """
+    Returns counts of people and movies and, if a component index was
+    built, of connected components and the size of the largest one.
+    """
+    _refresh_components()
+    statistics = {"people": len(people), "movies": len(movies)}
+    if component_index is not None:
+        statistics.update(component_index.stats())
+    return statistics
+
+
+def component_sizes():
+    """
+    Returns the size of every connected component, largest first.
+    """
+    if component_index is None:
+        raise ValueError("no component index, use load_data(..., components=True)")
+    _refresh_components()
+    return component_index.component_sizes()
+
+
+def _build_name_index():
+    """
+    Returns a NameIndex over the people loaded now.
+    """
+    if graph is None:
+        return NameIndex.from_names(names)
+    # The graph already keeps people sorted by name
+    order = graph.name_order
+    return NameIndex(
+        Column(lambda i: graph.person_names[order[i]].lower(), len(order)),
+        Column(lambda i: graph.person_ids[order[i]], len(order))
+    )
+
+
+def _refresh_components():
+    """
+    Rebuilds the component index if removals have left it inexact.
+    """
+    global component_index
+    if component_index is not None and not component_index.exact:
+        component_index = _build_components()
+
+
+def complete_name(prefix, limit=10):
+    """
+    Returns up to `limit` people whose name starts with `prefix`, as
+    dictionaries of person_id, name and birth, in name order.
+    """
+    _require_name_index()
+    person_ids = name_index.prefix(prefix.lower())
+    return [_candidate(person_id)
+            for person_id in itertools.islice(person_ids, limit)]
+
+
+def suggest_names(name, limit=10):
+    """
+    Returns up to `limit` people whose name is closest to `name`, as
+    dictionaries of person_id, name, birth and a similarity score
+    between 0 and 1, best first.
+    """
+    _require_name_index()
+    return [_candidate(person_id, score)
+            for score, person_id in name_index.similar(name.lower(), limit)]
+
+
+def _require_name_index():
+    if name_index is None:
+        raise ValueError("no name index, use load_data(..., index_names=True)")
+
+
+def _candidate(person_id, score=None):
+    """
+    Returns the description of a person returned by a name lookup.
+    """
+    person = people[person_id]
+    candidate = {
+        "person_id": person_id,
+        "name": person["name"],
+        "birth": person["birth"]
+    }
+    if score is not None:
+        candidate["score"] = round(score, 3)
+    return candidate
 
 
 def person_id_for_name(name):
@@ -164,6 +504,12 @@ def neighbors_for_person(person_id):
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if graph is not None:
+        return {
+            (graph.movie_ids[m], graph.person_ids[p])
+            for m, p in graph.neighbors(graph.person_index(person_id))
+        }
+
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
@@ -172,5 +518,142 @@ def neighbors_for_person(person_id):
     return neighbors
 
 
+def add_person(person_id, name, birth=""):
+    """
+    Adds a person who has not starred in any movie yet.
+    """
+    if graph is None:
+        if person_id in people:
+            raise ValueError(f"{person_id} already exists")
+        people[person_id] = {"name": name, "birth": birth, "movies": set()}
+        names.setdefault(name.lower(), set()).add(person_id)
+        person = person_id
+    else:
+        person = graph.add_person(person_id, name, birth)
+    if name_index is not None:
+        name_index.add(name.lower(), person_id)
+
+    # A newcomer is on their own, so no cached search result changes
+    if component_index is not None:
+        component_index.add(person)
+
+
+def add_movie(movie_id, title, year=""):
+    """
+    Adds a movie with no stars yet.
+    """
+    if graph is None:
+        if movie_id in movies:
+            raise ValueError(f"{movie_id} already exists")
+        movies[movie_id] = {"title": title, "year": year, "stars": set()}
+    else:
+        graph.add_movie(movie_id, title, year)
+
+
+def add_star(person_id, movie_id):
+    """
+    Records that a person starred in a movie, updating only what the new
+    edge can affect. Returns False if that was already known.
+    """
+    global landmark_index
+    person, movie = _keys(person_id, movie_id)
+    star = next(iter(_stars(movie)), None)
+    if graph is None:
+        if movie_id in people[person_id]["movies"]:
+            return False
+        people[person_id]["movies"].add(movie_id)
+        movies[movie_id]["stars"].add(person_id)
+    elif not graph.add_star(person, movie):
+        return False
+
+    # Only searches that reached one of the ends can find shorter paths now
+    tree_cache.discard_reaching(person)
+    if star is not None:
+        tree_cache.discard_reaching(star)
+        if component_index is not None:
+            component_index.union(person, star)
+    landmark_index = None
+    return True
+
+
+def remove_star(person_id, movie_id):
+    """
+    Forgets that a person starred in a movie, updating only what the
+    edge could affect. Returns False if that was not known.
+    """
+    global landmark_index
+    person, movie = _keys(person_id, movie_id)
+    if graph is None:
+        if movie_id not in people[person_id]["movies"]:
+            return False
+        people[person_id]["movies"].discard(movie_id)
+        movies[movie_id]["stars"].discard(person_id)
+    elif not graph.remove_star(person, movie):
+        return False
+
+    # Only searches that reached the person can have used the edge
+    tree_cache.discard_reaching(person)
+    if component_index is not None:
+        component_index.exact = False
+    landmark_index = None
+    return True
+
+
+def remove_person(person_id):
+    """
+    Removes a person and every movie credit they had.
+    """
+    for movie_id in list(people[person_id]["movies"]):
+        remove_star(person_id, movie_id)
+    if graph is None:
+        name = people.pop(person_id)["name"].lower()
+        names[name].discard(person_id)
+        if not names[name]:
+            del names[name]
+        person = person_id
+    else:
+        person = graph.person_index(person_id)
+        graph.remove_person(person)
+    if name_index is not None:
+        name_index.discard(person_id)
+    tree_cache.discard(person)
+    if component_index is not None:
+        component_index.discard(person)
+
+
+def remove_movie(movie_id):
+    """
+    Removes a movie and every star credit it had.
+    """
+    for person_id in list(movies[movie_id]["stars"]):
+        remove_star(person_id, movie_id)
+    if graph is None:
+        del movies[movie_id]
+    else:
+        graph.remove_movie(graph.movie_index(movie_id))
+
+
+def _keys(person_id, movie_id):
+    """
+    Returns the keys the search structures use for a person and a movie.
+    """
+    if graph is None:
+        if person_id not in people:
+            raise KeyError(person_id)
+        if movie_id not in movies:
+            raise KeyError(movie_id)
+        return person_id, movie_id
+    return graph.person_index(person_id), graph.movie_index(movie_id)
+
+
+def _stars(movie):
+    """
+    Returns the stars of a movie given its key from `_keys`.
+    """
+    if graph is None:
+        return movies[movie]["stars"]
+    return graph.stars_of(movie)
+
+
 if __name__ == "__main__":
     main()
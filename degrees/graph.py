@@ -0,0 +1,692 @@
+import array
+import bisect
+import csv
+import mmap
+import os
+import struct
+import sys
+from collections.abc import Mapping
+
+# Bump whenever the snapshot layout changes so old files are rebuilt
+SNAPSHOT_VERSION = 1
+SNAPSHOT_MAGIC = b"DEGSNAP\0"
+
+# Source files whose size and mtime are recorded in a snapshot
+SOURCES = ("people.csv", "movies.csv", "stars.csv")
+
+# StarGraph arrays in the order they are laid out in a snapshot
+SECTIONS = (
+    "person_ids", "person_names", "person_births",
+    "movie_ids", "movie_titles", "movie_years",
+    "person_offsets", "person_movies",
+    "movie_offsets", "movie_people", "name_order"
+)
+
+# Sections stored as StringTable (an offsets buffer followed by a data buffer)
+_STRING_SECTIONS = {
+    "person_ids", "person_names", "person_births",
+    "movie_ids", "movie_titles", "movie_years"
+}
+
+
+class StringTable():
+    """
+    Read-only sequence of strings stored as one UTF-8 blob plus an
+    array of offsets into it, instead of one Python object per string.
+    """
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    @classmethod
+    def from_strings(cls, strings):
+        """
+        Build a table holding `strings` in order.
+        """
+        offsets = array.array("i", [0])
+        chunks = []
+        position = 0
+        for string in strings:
+            encoded = string.encode("utf-8")
+            position += len(encoded)
+            chunks.append(encoded)
+            offsets.append(position)
+        return cls(offsets, b"".join(chunks))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        return str(self.data[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+
+class StarGraph():
+    """
+    Compact bipartite graph of people and the movies they starred in.
+
+    People and movies are interned to dense integers (their position in
+    `person_ids` / `movie_ids`, which are sorted so an ID can be found by
+    binary search). The star edges are kept twice in CSR form: the movies
+    of person `p` are `person_movies[person_offsets[p]:person_offsets[p + 1]]`
+    and the stars of movie `m` are
+    `movie_people[movie_offsets[m]:movie_offsets[m + 1]]`.
+    `name_order` lists person indexes sorted by lowercased name.
+
+    The CSR arrays are never modified. Once people, movies or stars are
+    added or removed, the changes are kept in an Overlay and every lookup
+    goes through it; new people and movies get the next free indexes.
+    """
+
+    def __init__(self, person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_offsets, person_movies,
+                 movie_offsets, movie_people, name_order):
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_people = movie_people
+        self.name_order = name_order
+        self.overlay = None
+
+    def person_index(self, person_id):
+        """
+        Returns the dense index of `person_id`, raising KeyError if unknown.
+        """
+        overlay = self.overlay
+        if overlay is None:
+            return _index(self.person_ids, person_id)
+        if person_id in overlay.person_index:
+            return overlay.person_index[person_id]
+        person = _index(overlay.person_ids, person_id)
+        if person in overlay.removed_people:
+            raise KeyError(person_id)
+        return person
+
+    def movie_index(self, movie_id):
+        """
+        Returns the dense index of `movie_id`, raising KeyError if unknown.
+        """
+        overlay = self.overlay
+        if overlay is None:
+            return _index(self.movie_ids, movie_id)
+        if movie_id in overlay.movie_index:
+            return overlay.movie_index[movie_id]
+        movie = _index(overlay.movie_ids, movie_id)
+        if movie in overlay.removed_movies:
+            raise KeyError(movie_id)
+        return movie
+
+    def people(self):
+        """
+        Yields the index of every person in the graph.
+        """
+        removed = self.overlay.removed_people if self.overlay else ()
+        for person in range(len(self.person_ids)):
+            if person not in removed:
+                yield person
+
+    def movies(self):
+        """
+        Yields the index of every movie in the graph.
+        """
+        removed = self.overlay.removed_movies if self.overlay else ()
+        for movie in range(len(self.movie_ids)):
+            if movie not in removed:
+                yield movie
+
+    def person_count(self):
+        """
+        Returns the number of people in the graph.
+        """
+        removed = self.overlay.removed_people if self.overlay else ()
+        return len(self.person_ids) - len(removed)
+
+    def movie_count(self):
+        """
+        Returns the number of movies in the graph.
+        """
+        removed = self.overlay.removed_movies if self.overlay else ()
+        return len(self.movie_ids) - len(removed)
+
+    def movies_of(self, person):
+        """
+        Yields the indexes of the movies person index `person` starred in.
+        """
+        overlay = self.overlay
+        if overlay is None or person < len(overlay.person_ids):
+            person_movies = self.person_movies
+            for k in range(self.person_offsets[person],
+                           self.person_offsets[person + 1]):
+                if overlay is None or (
+                        (person, person_movies[k]) not in overlay.removed):
+                    yield person_movies[k]
+        if overlay is not None:
+            yield from overlay.added_movies.get(person, ())
+
+    def stars_of(self, movie):
+        """
+        Yields the indexes of the people who starred in movie index `movie`.
+        """
+        overlay = self.overlay
+        if overlay is None or movie < len(overlay.movie_ids):
+            movie_people = self.movie_people
+            for k in range(self.movie_offsets[movie],
+                           self.movie_offsets[movie + 1]):
+                if overlay is None or (
+                        (movie_people[k], movie) not in overlay.removed):
+                    yield movie_people[k]
+        if overlay is not None:
+            yield from overlay.added_stars.get(movie, ())
+
+    def neighbors(self, person):
+        """
+        Yields (movie, person) index pairs for people who starred with
+        person index `person`, reading straight from the CSR arrays.
+        """
+        if self.overlay is not None:
+            for movie in self.movies_of(person):
+                for star in self.stars_of(movie):
+                    yield movie, star
+            return
+
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_people = self.movie_people
+        for k in range(person_offsets[person], person_offsets[person + 1]):
+            movie = person_movies[k]
+            for j in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                yield movie, movie_people[j]
+
+    def people_named(self, name):
+        """
+        Returns the indexes of people whose lowercased name is `name`.
+        """
+        key = self._name_key
+        start = bisect.bisect_left(self.name_order, name, key=key)
+        end = bisect.bisect_right(self.name_order, name, lo=start, key=key)
+        people = [self.name_order[k] for k in range(start, end)]
+        if self.overlay is not None:
+            people = [person for person in people
+                      if person not in self.overlay.removed_people]
+            people.extend(self.overlay.names.get(name, ()))
+        return people
+
+    def _name_key(self, person):
+        return self.person_names[person].lower()
+
+    def add_person(self, person_id, name, birth):
+        """
+        Adds a person with no movies and returns their index.
+        """
+        self._check_new(self.person_index, person_id)
+        overlay = self._open()
+        person = len(self.person_ids)
+        self.person_ids.append(person_id)
+        self.person_names.append(name)
+        self.person_births.append(birth)
+        overlay.person_index[person_id] = person
+        overlay.names.setdefault(name.lower(), set()).add(person)
+        return person
+
+    def add_movie(self, movie_id, title, year):
+        """
+        Adds a movie with no stars and returns its index.
+        """
+        self._check_new(self.movie_index, movie_id)
+        overlay = self._open()
+        movie = len(self.movie_ids)
+        self.movie_ids.append(movie_id)
+        self.movie_titles.append(title)
+        self.movie_years.append(year)
+        overlay.movie_index[movie_id] = movie
+        return movie
+
+    def add_star(self, person, movie):
+        """
+        Records that person index `person` starred in movie index `movie`.
+        Returns False if that was already known.
+        """
+        if movie in self.movies_of(person):
+            return False
+        overlay = self._open()
+        if (person, movie) in overlay.removed:
+            overlay.removed.discard((person, movie))
+        else:
+            overlay.added_movies.setdefault(person, set()).add(movie)
+            overlay.added_stars.setdefault(movie, set()).add(person)
+        return True
+
+    def remove_star(self, person, movie):
+        """
+        Forgets that person index `person` starred in movie index `movie`.
+        Returns False if that was not known.
+        """
+        if movie not in self.movies_of(person):
+            return False
+        overlay = self._open()
+        if movie in overlay.added_movies.get(person, ()):
+            overlay.added_movies[person].discard(movie)
+            overlay.added_stars[movie].discard(person)
+        else:
+            overlay.removed.add((person, movie))
+        return True
+
+    def remove_person(self, person):
+        """
+        Removes person index `person`, who must no longer star in anything.
+        """
+        overlay = self._open()
+        person_id = self.person_ids[person]
+        if overlay.person_index.get(person_id) == person:
+            del overlay.person_index[person_id]
+            overlay.names[self.person_names[person].lower()].discard(person)
+        overlay.removed_people.add(person)
+
+    def remove_movie(self, movie):
+        """
+        Removes movie index `movie`, which must no longer have any stars.
+        """
+        overlay = self._open()
+        movie_id = self.movie_ids[movie]
+        if overlay.movie_index.get(movie_id) == movie:
+            del overlay.movie_index[movie_id]
+        overlay.removed_movies.add(movie)
+
+    def _check_new(self, index, key):
+        try:
+            index(key)
+        except KeyError:
+            return
+        raise ValueError(f"{key} already exists")
+
+    def _open(self):
+        """
+        Returns the Overlay, switching the graph over to one if needed.
+        """
+        if self.overlay is None:
+            self.overlay = Overlay(self)
+            self.person_ids = Appended(self.person_ids)
+            self.person_names = Appended(self.person_names)
+            self.person_births = Appended(self.person_births)
+            self.movie_ids = Appended(self.movie_ids)
+            self.movie_titles = Appended(self.movie_titles)
+            self.movie_years = Appended(self.movie_years)
+        return self.overlay
+
+
+class Overlay():
+    """
+    Changes made to a StarGraph since it was loaded.
+    """
+
+    def __init__(self, graph):
+        # The sorted ID tables that binary searches must stick to
+        self.person_ids = graph.person_ids
+        self.movie_ids = graph.movie_ids
+
+        # Indexes of people and movies added since loading
+        self.person_index = {}
+        self.movie_index = {}
+        self.names = {}
+
+        # Star edges added since loading, in both directions
+        self.added_movies = {}
+        self.added_stars = {}
+
+        # Loaded star edges, people and movies removed since loading
+        self.removed = set()
+        self.removed_people = set()
+        self.removed_movies = set()
+
+
+class Appended():
+    """
+    Sequence of the items of a read-only sequence followed by a list of
+    items appended to it.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.extra = []
+
+    def append(self, item):
+        self.extra.append(item)
+
+    def __len__(self):
+        return len(self.base) + len(self.extra)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if i < len(self.base):
+            return self.base[i]
+        return self.extra[i - len(self.base)]
+
+
+class PeopleView(Mapping):
+    """
+    Read-only `people` mapping backed by a StarGraph: person_id to a
+    dictionary of name, birth, movies (a set of movie_ids).
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, person_id):
+        graph = self.graph
+        person = graph.person_index(person_id)
+        return {
+            "name": graph.person_names[person],
+            "birth": graph.person_births[person],
+            "movies": {graph.movie_ids[m] for m in graph.movies_of(person)}
+        }
+
+    def __contains__(self, person_id):
+        try:
+            self.graph.person_index(person_id)
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        graph = self.graph
+        return (graph.person_ids[p] for p in graph.people())
+
+    def __len__(self):
+        return self.graph.person_count()
+
+
+class MoviesView(Mapping):
+    """
+    Read-only `movies` mapping backed by a StarGraph: movie_id to a
+    dictionary of title, year, stars (a set of person_ids).
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, movie_id):
+        graph = self.graph
+        movie = graph.movie_index(movie_id)
+        return {
+            "title": graph.movie_titles[movie],
+            "year": graph.movie_years[movie],
+            "stars": {graph.person_ids[p] for p in graph.stars_of(movie)}
+        }
+
+    def __contains__(self, movie_id):
+        try:
+            self.graph.movie_index(movie_id)
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        graph = self.graph
+        return (graph.movie_ids[m] for m in graph.movies())
+
+    def __len__(self):
+        return self.graph.movie_count()
+
+
+class NamesView(Mapping):
+    """
+    Read-only `names` mapping backed by a StarGraph: lowercased name to
+    a set of corresponding person_ids.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, name):
+        people = self.graph.people_named(name)
+        if not people:
+            raise KeyError(name)
+        return {self.graph.person_ids[p] for p in people}
+
+    def __iter__(self):
+        graph = self.graph
+        if graph.overlay is not None:
+            yield from sorted(
+                {graph.person_names[p].lower() for p in graph.people()}
+            )
+            return
+        previous = None
+        for person in graph.name_order:
+            name = graph.person_names[person].lower()
+            if name != previous:
+                yield name
+                previous = name
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+def read_graph(directory):
+    """
+    Load the CSV files in `directory` into a StarGraph.
+    """
+    # Load people, keeping the last row for a repeated id like load_data
+    people = {}
+    with open(f"{directory}/people.csv", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            people[row["id"]] = (row["name"], row["birth"])
+    person_ids = sorted(people)
+    person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+
+    # Load movies
+    movies = {}
+    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            movies[row["id"]] = (row["title"], row["year"])
+    movie_ids = sorted(movies)
+    movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+
+    # Load stars, dropping duplicates and rows that reference unknown ids
+    edges = set()
+    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            try:
+                edges.add((person_index[row["person_id"]],
+                           movie_index[row["movie_id"]]))
+            except KeyError:
+                pass
+
+    person_offsets, person_movies = _csr(len(person_ids), sorted(edges))
+    movie_offsets, movie_people = _csr(
+        len(movie_ids), sorted((m, p) for p, m in edges)
+    )
+
+    names = [people[person_id][0] for person_id in person_ids]
+    name_order = array.array(
+        "i", sorted(range(len(names)), key=lambda p: names[p].lower())
+    )
+
+    return StarGraph(
+        StringTable.from_strings(person_ids),
+        StringTable.from_strings(names),
+        StringTable.from_strings(people[i][1] for i in person_ids),
+        StringTable.from_strings(movie_ids),
+        StringTable.from_strings(movies[i][0] for i in movie_ids),
+        StringTable.from_strings(movies[i][1] for i in movie_ids),
+        person_offsets, person_movies,
+        movie_offsets, movie_people,
+        name_order
+    )
+
+
+def load_graph(directory, snapshot=True):
+    """
+    Load `directory` into a StarGraph, going through a binary snapshot
+    stored next to it when `snapshot` is true.
+
+    A snapshot whose recorded CSV sizes and mtimes no longer match is
+    ignored and rewritten. Failing to write one is not an error.
+    """
+    if not snapshot:
+        return read_graph(directory)
+
+    path = snapshot_path(directory)
+    stamps = source_stamps(directory)
+    graph = read_snapshot(path, stamps)
+    if graph is None:
+        graph = read_graph(directory)
+        try:
+            write_snapshot(graph, path, stamps)
+        except OSError:
+            pass
+    return graph
+
+
+def snapshot_path(directory):
+    """
+    Returns the path of the snapshot file for a CSV directory.
+    """
+    return os.path.normpath(directory) + ".snapshot"
+
+
+def source_stamps(directory):
+    """
+    Returns (size, mtime_ns) of each source CSV file, flattened.
+    """
+    stamps = []
+    for filename in SOURCES:
+        stat = os.stat(os.path.join(directory, filename))
+        stamps.extend((stat.st_size, stat.st_mtime_ns))
+    return tuple(stamps)
+
+
+def write_snapshot(graph, path, stamps):
+    """
+    Write `graph` to `path` as a snapshot tagged with the source `stamps`.
+
+    The file is a fixed header (magic, version, byte order, stamps and an
+    offset/length per section) followed by the raw array and string
+    table buffers, each aligned to 8 bytes so they can be cast in place.
+    """
+    if graph.overlay is not None:
+        raise ValueError("cannot snapshot a graph modified since loading")
+    buffers = []
+    for name in SECTIONS:
+        value = getattr(graph, name)
+        if isinstance(value, StringTable):
+            buffers.extend((value.offsets, value.data))
+        else:
+            buffers.append(value)
+
+    header = _header_format(len(buffers))
+    position = _align(struct.calcsize(header))
+    layout = []
+    for buffer in buffers:
+        length = len(memoryview(buffer).cast("B"))
+        layout.extend((position, length))
+        position = _align(position + length)
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(struct.pack(
+            header, SNAPSHOT_MAGIC, SNAPSHOT_VERSION,
+            sys.byteorder == "little", *stamps, *layout
+        ))
+        for offset, buffer in zip(layout[::2], buffers):
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(memoryview(buffer).cast("B"))
+    os.replace(temporary, path)
+
+
+def read_snapshot(path, stamps):
+    """
+    Memory-map the snapshot at `path` and return a StarGraph whose arrays
+    point straight into the mapping, or None if the file is missing,
+    truncated, from another version or byte order, or built from other
+    sources.
+    """
+    try:
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    count = sum(2 if name in _STRING_SECTIONS else 1 for name in SECTIONS)
+    header = _header_format(count)
+    if len(buffer) < struct.calcsize(header):
+        return None
+    fields = struct.unpack_from(header, buffer)
+    magic, version, little, stored_stamps = (
+        fields[0], fields[1], fields[2], fields[3:3 + len(SOURCES) * 2]
+    )
+    if (magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION
+            or little != (sys.byteorder == "little")
+            or stored_stamps != tuple(stamps)):
+        return None
+
+    # Every section must lie inside the file and hold whole items: int
+    # arrays throughout, except the bytes of each string table
+    layout = fields[3 + len(SOURCES) * 2:]
+    item = array.array("i").itemsize
+    sizes = []
+    for name in SECTIONS:
+        sizes.extend((item, 1) if name in _STRING_SECTIONS else (item,))
+    for offset, length, size in zip(layout[::2], layout[1::2], sizes):
+        if (offset < 0 or length < 0 or offset + length > len(buffer)
+                or length % size):
+            return None
+
+    view = memoryview(buffer)
+    sections = [
+        view[offset:offset + length]
+        for offset, length in zip(layout[::2], layout[1::2])
+    ]
+    values = []
+    for name in SECTIONS:
+        if name in _STRING_SECTIONS:
+            offsets, data = sections.pop(0), sections.pop(0)
+            values.append(StringTable(offsets.cast("i"), data))
+        else:
+            values.append(sections.pop(0).cast("i"))
+    graph = StarGraph(*values)
+    # Keep the mapping alive for as long as the graph uses it
+    graph.buffer = buffer
+    return graph
+
+
+def _header_format(count):
+    return f"<8sI?{len(SOURCES) * 2}q{count * 2}q"
+
+
+def _align(position):
+    return (position + 7) & ~7
+
+
+def _csr(size, pairs):
+    """
+    Returns (offsets, targets) arrays for `size` sources from a list of
+    (source, target) pairs sorted by source.
+    """
+    offsets = array.array("i", [0]) * (size + 1)
+    targets = array.array("i", (target for _, target in pairs))
+    for source, _ in pairs:
+        offsets[source + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+    return offsets, targets
+
+
+def _index(table, key):
+    """
+    Returns the position of `key` in the sorted sequence `table`.
+    """
+    i = bisect.bisect_left(table, key)
+    if i == len(table) or table[i] != key:
+        raise KeyError(key)
+    return i
@@ -0,0 +1,182 @@
+import array
+import mmap
+import os
+import struct
+import sys
+
+from graph import source_stamps
+
+# Bump whenever the landmark file layout changes so old files are rebuilt
+LANDMARKS_VERSION = 1
+LANDMARKS_MAGIC = b"DEGLMK\0\0"
+
+# Marks a person a landmark cannot reach
+UNREACHABLE = -1
+
+
+class LandmarkIndex():
+    """
+    BFS distances (in degrees of separation) from `k` landmark people to
+    every person of a StarGraph.
+
+    By the triangle inequality, for any landmark L and people a, b:
+        |d(L, a) - d(L, b)| <= d(a, b) <= d(L, a) + d(L, b)
+    so each landmark gives a lower and an upper bound in O(1).
+    """
+
+    def __init__(self, landmarks, distances):
+        self.landmarks = landmarks
+        self.distances = distances
+        # People added after the index was built are beyond its arrays
+        self.size = len(distances[0]) if distances else 0
+
+    @classmethod
+    def build(cls, graph, k):
+        """
+        Picks the `k` people with the most co-star edges as landmarks and
+        runs one BFS from each of them.
+        """
+        size = len(graph.person_ids)
+        degree = [0] * size
+        for movie in range(len(graph.movie_ids)):
+            cast = graph.movie_offsets[movie + 1] - graph.movie_offsets[movie]
+            for person in graph.stars_of(movie):
+                degree[person] += cast
+        landmarks = sorted(range(size), key=degree.__getitem__, reverse=True)
+        landmarks = array.array("i", landmarks[:k])
+        distances = [_distances(graph, landmark) for landmark in landmarks]
+        return cls(landmarks, distances)
+
+    def bounds(self, a, b):
+        """
+        Returns (lower, upper) bounds on the degrees of separation between
+        person indexes `a` and `b`.
+
+        `upper` is None when no landmark reaches both people. If a landmark
+        reaches exactly one of them they are not connected, and both bounds
+        are None.
+        """
+        if a == b:
+            return 0, 0
+        lower, upper = 1, None
+        if a >= self.size or b >= self.size:
+            return lower, upper
+        for distances in self.distances:
+            da, db = distances[a], distances[b]
+            if da == UNREACHABLE and db == UNREACHABLE:
+                continue
+            if da == UNREACHABLE or db == UNREACHABLE:
+                return None, None
+            lower = max(lower, abs(da - db))
+            if upper is None or da + db < upper:
+                upper = da + db
+        return lower, upper
+
+    def lower_bound(self, a, b):
+        """
+        Returns a lower bound on the degrees of separation between `a` and
+        `b`, or None if they are known not to be connected.
+        """
+        lower = 0
+        if a >= self.size or b >= self.size:
+            return lower
+        for distances in self.distances:
+            da, db = distances[a], distances[b]
+            if (da == UNREACHABLE) != (db == UNREACHABLE):
+                return None
+            if da - db > lower:
+                lower = da - db
+            elif db - da > lower:
+                lower = db - da
+        return lower
+
+
+def load_landmarks(graph, directory, k):
+    """
+    Returns the LandmarkIndex with `k` landmarks for the StarGraph loaded
+    from `directory`, reading it from `<directory>.landmarks` when that
+    file matches the current CSV files and writing it otherwise.
+    """
+    path = os.path.normpath(directory) + ".landmarks"
+    stamps = source_stamps(directory)
+    index = read_landmarks(path, stamps, len(graph.person_ids), k)
+    if index is None:
+        index = LandmarkIndex.build(graph, k)
+        try:
+            write_landmarks(index, path, stamps)
+        except OSError:
+            pass
+    return index
+
+
+def write_landmarks(index, path, stamps):
+    """
+    Write `index` to `path`: a header followed by the landmark indexes
+    and one distance array per landmark.
+    """
+    size = len(index.distances[0]) if index.distances else 0
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(struct.pack(
+            _header_format(len(stamps)), LANDMARKS_MAGIC, LANDMARKS_VERSION,
+            sys.byteorder == "little", *stamps, len(index.landmarks), size
+        ))
+        f.write(memoryview(index.landmarks).cast("B"))
+        for distances in index.distances:
+            f.write(memoryview(distances).cast("B"))
+    os.replace(temporary, path)
+
+
+def read_landmarks(path, stamps, size, k):
+    """
+    Memory-map the landmark file at `path`, or return None if it is
+    missing or does not match `stamps`, `size` people and `k` landmarks.
+    """
+    try:
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    header = _header_format(len(stamps))
+    start = struct.calcsize(header)
+    itemsize = array.array("i").itemsize
+    if len(buffer) < start:
+        return None
+    fields = struct.unpack_from(header, buffer)
+    if (fields[0] != LANDMARKS_MAGIC or fields[1] != LANDMARKS_VERSION
+            or fields[2] != (sys.byteorder == "little")
+            or fields[3:-2] != tuple(stamps)
+            or fields[-2:] != (k, size)
+            or len(buffer) != start + itemsize * k * (size + 1)):
+        return None
+
+    view = memoryview(buffer)[start:].cast("i")
+    return LandmarkIndex(
+        view[:k],
+        [view[k + i * size:k + (i + 1) * size] for i in range(k)]
+    )
+
+
+def _distances(graph, source):
+    """
+    Returns an array of BFS distances from person index `source`.
+    """
+    distances = array.array("i", [UNREACHABLE]) * len(graph.person_ids)
+    distances[source] = 0
+    frontier = [source]
+    depth = 0
+    while frontier:
+        depth += 1
+        next_frontier = []
+        for person in frontier:
+            for _, neighbor in graph.neighbors(person):
+                if distances[neighbor] == UNREACHABLE:
+                    distances[neighbor] = depth
+                    next_frontier.append(neighbor)
+        frontier = next_frontier
+    return distances
+
+
+def _header_format(stamps):
+    return f"<8sI?{stamps}qqq"
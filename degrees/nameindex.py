@@ -0,0 +1,165 @@
+import array
+import bisect
+import collections
+import heapq
+
+# Least trigram similarity for a name to count as a "did you mean" match
+MIN_SIMILARITY = 0.3
+
+
+class NameIndex():
+    """
+    Prefix and fuzzy lookups over people's lowercased names.
+
+    `names` is a sorted sequence of lowercased names and `person_ids` the
+    matching person_ids, so every name with a given prefix sits in one
+    contiguous range found by binary search. For "did you mean" lookups
+    names are compared by their character trigrams, through an inverted
+    index built the first time it is needed.
+
+    People added later are kept in a short side list and people removed
+    later are filtered out, so neither needs the sorted arrays rebuilt.
+    """
+
+    def __init__(self, names, person_ids):
+        self.names = names
+        self.person_ids = person_ids
+        self.added = []
+        self.removed = set()
+
+        # Filled in by _build_grams
+        self.grams = None
+        self.starts = None
+        self.sizes = None
+
+    @classmethod
+    def from_names(cls, names):
+        """
+        Builds an index from a mapping of lowercased name to person_ids.
+        """
+        pairs = sorted(
+            (name, person_id)
+            for name, person_ids in names.items()
+            for person_id in person_ids
+        )
+        return cls([name for name, _ in pairs], [pid for _, pid in pairs])
+
+    def add(self, name, person_id):
+        """
+        Adds `person_id` under the lowercased `name`.
+        """
+        self.added.append((name, person_id))
+
+    def discard(self, person_id):
+        """
+        Stops returning `person_id`.
+        """
+        self.added = [(n, p) for n, p in self.added if p != person_id]
+        self.removed.add(person_id)
+
+    def prefix(self, prefix):
+        """
+        Yields the person_ids whose lowercased name starts with `prefix`,
+        in name order.
+        """
+        names = self.names
+        for i in range(bisect.bisect_left(names, prefix), len(names)):
+            if not names[i].startswith(prefix):
+                break
+            person_id = self.person_ids[i]
+            if person_id not in self.removed:
+                yield person_id
+        for name, person_id in sorted(self.added):
+            if name.startswith(prefix):
+                yield person_id
+
+    def similar(self, name, limit=10, min_score=MIN_SIMILARITY):
+        """
+        Returns up to `limit` (score, person_id) pairs for the names most
+        similar to the lowercased `name`, best first. The score is the
+        Dice coefficient of the two names' trigram sets, between 0 and 1,
+        and names scoring below `min_score` are left out.
+        """
+        if self.grams is None:
+            self._build_grams()
+        query = _trigrams(name)
+        if not query:
+            return []
+
+        # Count the trigrams each distinct name shares with the query
+        shared = collections.Counter()
+        for gram in query:
+            shared.update(self.grams.get(gram, ()))
+        best = heapq.nlargest(
+            limit, shared.items(),
+            key=lambda item: 2 * item[1] / (len(query) + self.sizes[item[0]])
+        )
+
+        candidates = []
+        for distinct, count in best:
+            score = 2 * count / (len(query) + self.sizes[distinct])
+            end = (self.starts[distinct + 1] if distinct + 1 < len(self.starts)
+                   else len(self.names))
+            for i in range(self.starts[distinct], end):
+                if self.person_ids[i] not in self.removed:
+                    candidates.append((score, self.person_ids[i]))
+        for added, person_id in self.added:
+            grams = _trigrams(added)
+            score = 2 * len(query & grams) / (len(query) + len(grams))
+            if score:
+                candidates.append((score, person_id))
+
+        candidates = [c for c in candidates if c[0] >= min_score]
+        candidates.sort(key=lambda candidate: -candidate[0])
+        return candidates[:limit]
+
+    def _build_grams(self):
+        """
+        Builds the trigram inverted index over the distinct names.
+        """
+        grams = collections.defaultdict(lambda: array.array("i"))
+        starts = array.array("i")
+        sizes = array.array("i")
+        previous = None
+        for i in range(len(self.names)):
+            name = self.names[i]
+            if name == previous:
+                continue
+            previous = name
+            distinct = len(starts)
+            starts.append(i)
+            name_grams = _trigrams(name)
+            sizes.append(len(name_grams))
+            for gram in name_grams:
+                grams[gram].append(distinct)
+        self.grams = dict(grams)
+        self.starts = starts
+        self.sizes = sizes
+
+
+class Column():
+    """
+    Read-only sequence computing item `i` as `function(i)`, used to give
+    binary search a view over data stored in another order.
+    """
+
+    def __init__(self, function, length):
+        self.function = function
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.length:
+            raise IndexError(i)
+        return self.function(i)
+
+
+def _trigrams(name):
+    """
+    Returns the set of character trigrams of `name`, padded so that the
+    start and end of the name count too.
+    """
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
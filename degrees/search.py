@@ -0,0 +1,341 @@
+import array
+import collections
+import sys
+
+# Sources whose search work TreeCache remembers before starting over
+MAX_TRACKED_SOURCES = 100000
+
+
+def bidirectional_search(source, target, neighbors,
+                         lower_bound=None, limit=None):
+    """
+    Returns the shortest list of (movie, person) pairs that connect
+    `source` to `target`, or None if there is no such path.
+
+    `neighbors` maps a person to an iterable of (movie, person) pairs.
+    The search grows one BFS from each end, always expanding the side
+    with the smaller frontier, and keeps a parent pointer per discovered
+    person instead of copying partial paths.
+
+    Given `lower_bound(a, b)` (a lower bound on the distance between two
+    people, None if they are not connected) and `limit` (an upper bound
+    on the distance from source to target), people that cannot lie on a
+    path of at most `limit` steps are never expanded.
+    """
+    if source == target:
+        return None
+
+    # Maps each discovered person to the (movie, person) edge it was reached by
+    forward = {source: None}
+    backward = {target: None}
+    forward_frontier = [source]
+    backward_frontier = [target]
+    forward_depth = backward_depth = 0
+
+    while forward_frontier and backward_frontier:
+        if len(forward_frontier) <= len(backward_frontier):
+            forward_depth += 1
+            forward_frontier, meeting = _expand(
+                forward_frontier, forward, backward, neighbors,
+                _pruner(lower_bound, limit, forward_depth, target)
+            )
+        else:
+            backward_depth += 1
+            backward_frontier, meeting = _expand(
+                backward_frontier, backward, forward, neighbors,
+                _pruner(lower_bound, limit, backward_depth, source)
+            )
+        if meeting is not None:
+            return _join(meeting, forward, backward)
+
+    return None
+
+
+def _pruner(lower_bound, limit, depth, end):
+    """
+    Returns a predicate telling whether a person first reached at `depth`
+    is too far from `end` to be on a path of at most `limit` steps.
+    """
+    if lower_bound is None or limit is None:
+        return None
+
+    def prune(person):
+        bound = lower_bound(person, end)
+        return bound is None or depth + bound > limit
+    return prune
+
+
+def _expand(frontier, parents, other, neighbors, prune=None):
+    """
+    Expands a whole BFS layer of `frontier`, recording parent pointers.
+
+    Returns the next layer and the first person also discovered by the
+    other side (None if the two searches have not met yet). Every meeting
+    point found in the first layer that touches the other search lies on
+    a shortest path, so the first one is enough. People rejected by
+    `prune` are skipped; no shortest path goes through them.
+    """
+    next_frontier = []
+    rejected = set()
+    for person in frontier:
+        for movie, neighbor in neighbors(person):
+            if neighbor in parents or neighbor in rejected:
+                continue
+            if prune is not None and prune(neighbor):
+                rejected.add(neighbor)
+                continue
+            parents[neighbor] = (movie, person)
+            if neighbor in other:
+                return next_frontier, neighbor
+            next_frontier.append(neighbor)
+    return next_frontier, None
+
+
+def _join(meeting, forward, backward):
+    """
+    Builds the (movie, person) path through the `meeting` person from the
+    parent pointers of both searches.
+    """
+    path = []
+    person = meeting
+    while forward[person] is not None:
+        movie, parent = forward[person]
+        path.append((movie, person))
+        person = parent
+    path.reverse()
+
+    person = meeting
+    while backward[person] is not None:
+        movie, child = backward[person]
+        path.append((movie, child))
+        person = child
+    return path
+
+
+def all_shortest_paths(source, target, neighbors, limit=None):
+    """
+    Yields every shortest list of (movie, person) pairs that connects
+    `source` to `target`, at most `limit` of them if given.
+
+    A BFS from `source` records, for each person, every (movie, person)
+    edge from the previous layer, stopping once the layer holding
+    `target` is complete. Paths are then read off that DAG one at a time
+    by a depth-first walk back from `target`, so memory stays
+    proportional to the DAG however many paths there are.
+    """
+    if source == target or limit == 0:
+        return
+
+    # Maps each discovered person to its edges from the previous layer
+    predecessors = {source: []}
+    frontier = [source]
+    while frontier and target not in predecessors:
+        layer = {}
+        for person in frontier:
+            for movie, neighbor in neighbors(person):
+                if neighbor in predecessors:
+                    continue
+                layer.setdefault(neighbor, []).append((movie, person))
+        predecessors.update(layer)
+        frontier = list(layer)
+    if target not in predecessors:
+        return
+
+    count = 0
+    path = []
+    stack = [(target, iter(predecessors[target]))]
+    while stack:
+        person, edges = stack[-1]
+        edge = next(edges, None)
+        if edge is None:
+            stack.pop()
+            if path:
+                path.pop()
+            continue
+        movie, parent = edge
+        path.append((movie, person))
+        if parent == source:
+            yield path[::-1]
+            count += 1
+            if count == limit:
+                return
+            path.pop()
+        else:
+            stack.append((parent, iter(predecessors[parent])))
+
+
+class BFSTree():
+    """
+    Complete BFS parent tree from one source person.
+
+    With `size` (the number of people in an integer-indexed graph) the
+    parent pointers are kept in two flat arrays, otherwise in a dict.
+    """
+
+    def __init__(self, source, neighbors, size=None):
+        self.source = source
+        if size is None:
+            self.parents = {source: None}
+            self.movies = None
+            seen = self.parents.__contains__
+        else:
+            self.parents = array.array("i", [-1]) * size
+            self.movies = array.array("i", [-1]) * size
+            self.parents[source] = source
+            seen = self._seen
+
+        frontier = [source]
+        while frontier:
+            next_frontier = []
+            for person in frontier:
+                for movie, neighbor in neighbors(person):
+                    if seen(neighbor):
+                        continue
+                    if self.movies is None:
+                        self.parents[neighbor] = (movie, person)
+                    else:
+                        self.parents[neighbor] = person
+                        self.movies[neighbor] = movie
+                    next_frontier.append(neighbor)
+            frontier = next_frontier
+
+    def _seen(self, person):
+        return self.parents[person] != -1
+
+    def reaches(self, person):
+        """
+        Returns whether `person` is connected to the source.
+        """
+        if self.movies is None:
+            return person in self.parents
+        return person < len(self.parents) and self.parents[person] != -1
+
+    def path_to(self, target):
+        """
+        Returns the shortest (movie, person) path from the source to
+        `target`, or None if `target` is the source or unreachable.
+        """
+        if target == self.source or not self.reaches(target):
+            return None
+        path = []
+        person = target
+        if self.movies is None:
+            while person != self.source:
+                movie, parent = self.parents[person]
+                path.append((movie, person))
+                person = parent
+        else:
+            while person != self.source:
+                path.append((self.movies[person], person))
+                person = self.parents[person]
+        path.reverse()
+        return path
+
+    def nbytes(self):
+        """
+        Returns an estimate of the memory held by the tree in bytes.
+        """
+        if self.movies is not None:
+            return 2 * self.parents.itemsize * len(self.parents)
+        edge = sys.getsizeof((None, None))
+        return sys.getsizeof(self.parents) + edge * len(self.parents)
+
+
+class TreeCache():
+    """
+    LRU cache of BFSTree objects keyed by source, bounded by `max_bytes`.
+
+    Building a tree expands everyone connected to its source, which can
+    cost thousands of searches that each expand a few people. So the
+    people expanded by searches from each source are added up through
+    `record`, and `wants` only reports a source once they reach the cost
+    of its tree: then at most twice the work of searching alone is spent,
+    however often the source comes back. With `enabled` false no tree is
+    ever wanted.
+    """
+
+    def __init__(self, max_bytes=256 * 2 ** 20, enabled=True):
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.trees = collections.OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.source_work = collections.Counter()
+
+    def get(self, source):
+        """
+        Returns the cached tree for `source` or None, counting the lookup.
+        """
+        tree = self.trees.get(source)
+        if tree is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.trees.move_to_end(source)
+        return tree
+
+    def record(self, source, expanded):
+        """
+        Adds the number of people a search from `source` `expanded`.
+        """
+        if len(self.source_work) >= MAX_TRACKED_SOURCES:
+            self.source_work.clear()
+        self.source_work[source] += expanded
+
+    def wants(self, source, cost):
+        """
+        Returns whether a tree from `source`, which would expand `cost`
+        people, should be built and cached.
+        """
+        return self.enabled and self.source_work[source] >= cost
+
+    def put(self, tree):
+        """
+        Caches `tree`, evicting least recently used trees to stay in budget.
+        """
+        size = tree.nbytes()
+        if size > self.max_bytes:
+            return
+        self.discard(tree.source)
+        while self.bytes + size > self.max_bytes:
+            _, evicted = self.trees.popitem(last=False)
+            self.bytes -= evicted.nbytes()
+        self.trees[tree.source] = tree
+        self.bytes += size
+        self.source_work.pop(tree.source, None)
+
+    def discard(self, source):
+        """
+        Drops the tree for `source`, if cached.
+        """
+        tree = self.trees.pop(source, None)
+        if tree is not None:
+            self.bytes -= tree.nbytes()
+
+    def discard_reaching(self, person):
+        """
+        Drops every tree whose source is connected to `person`.
+        """
+        for source in [source for source, tree in self.trees.items()
+                       if tree.reaches(person)]:
+            self.discard(source)
+
+    def clear(self):
+        """
+        Drops every cached tree. Counters are kept.
+        """
+        self.trees.clear()
+        self.source_work.clear()
+        self.bytes = 0
+
+    def stats(self):
+        """
+        Returns the hit/miss counters and current size of the cache.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "trees": len(self.trees),
+            "bytes": self.bytes
+        }
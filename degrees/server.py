@@ -0,0 +1,275 @@
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import sys
+import time
+import urllib.parse
+
+import degrees
+
+# Latencies kept per endpoint for the percentiles reported by /metrics
+LATENCY_WINDOW = 4096
+
+# Longest request line or header line accepted, in bytes
+MAX_LINE = 8192
+
+
+class Metrics():
+    """
+    Request counts, errors and recent latencies per endpoint.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.requests = collections.Counter()
+        self.errors = collections.Counter()
+        self.latencies = collections.defaultdict(
+            lambda: collections.deque(maxlen=LATENCY_WINDOW)
+        )
+        self.in_flight = 0
+
+    def record(self, endpoint, seconds, status):
+        self.requests[endpoint] += 1
+        if status >= 400:
+            self.errors[endpoint] += 1
+        self.latencies[endpoint].append(seconds)
+
+    def report(self):
+        endpoints = {}
+        for endpoint, count in self.requests.items():
+            latencies = sorted(self.latencies[endpoint])
+            endpoints[endpoint] = {
+                "requests": count,
+                "errors": self.errors[endpoint],
+                "latency_ms": {
+                    "mean": _ms(sum(latencies) / len(latencies)),
+                    "p50": _ms(_percentile(latencies, 0.50)),
+                    "p95": _ms(_percentile(latencies, 0.95)),
+                    "p99": _ms(_percentile(latencies, 0.99)),
+                    "max": _ms(latencies[-1])
+                }
+            }
+        return {
+            "uptime_s": round(time.monotonic() - self.started, 3),
+            "in_flight": self.in_flight,
+            "endpoints": endpoints
+        }
+
+
+class Server():
+    """
+    HTTP/1.1 server answering degrees queries from a resident graph.
+
+    The event loop only parses requests and writes responses. Searches
+    and name lookups run in a process pool whose workers each map the
+    graph snapshot once, so a slow search never blocks other clients.
+
+    Endpoints (all GET, all answering JSON):
+        /path?source=...&target=...   degrees and path between two people
+        /complete?prefix=...&limit=n  names starting with a prefix
+        /suggest?name=...&limit=n     closest names to a misspelt one
+        /metrics                      request counts and latency percentiles
+    """
+
+    def __init__(self, directory, processes=None):
+        # Build or refresh the snapshot once before any worker maps it
+        degrees.load_data(directory, snapshot=True)
+        self.pool = concurrent.futures.ProcessPoolExecutor(
+            processes, initializer=degrees.init_worker,
+            initargs=(directory,)
+        )
+        self.metrics = Metrics()
+
+    async def handle(self, reader, writer):
+        """
+        Serves the requests of one connection until it is closed.
+        """
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, target, version, headers = request
+                if method is None:
+                    # No telling where the next request starts, so stop here
+                    self.metrics.record("error", 0.0, 400)
+                    _write_response(
+                        writer, 400, {"error": "malformed request"}, False
+                    )
+                    await writer.drain()
+                    break
+
+                started = time.perf_counter()
+                # /metrics reports in_flight, so it leaves itself out
+                counted = urllib.parse.urlsplit(target).path != "/metrics"
+                self.metrics.in_flight += counted
+                try:
+                    endpoint, status, body = await self.respond(method, target)
+                except Exception as e:
+                    endpoint, status, body = "error", 500, {"error": repr(e)}
+                finally:
+                    self.metrics.in_flight -= counted
+                self.metrics.record(
+                    endpoint, time.perf_counter() - started, status
+                )
+
+                keep_alive = (
+                    headers.get("connection", "").lower() != "close"
+                    if version == "HTTP/1.1"
+                    else headers.get("connection", "").lower() == "keep-alive"
+                )
+                _write_response(writer, status, body, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, method, target):
+        """
+        Returns (endpoint, status, body) for one request.
+        """
+        url = urllib.parse.urlsplit(target)
+        endpoint = url.path
+        query = dict(urllib.parse.parse_qsl(url.query))
+        if method != "GET":
+            return endpoint, 405, {"error": "only GET is supported"}
+
+        if endpoint == "/metrics":
+            return endpoint, 200, self.metrics.report()
+        if endpoint == "/path":
+            if "source" not in query or "target" not in query:
+                return endpoint, 400, {"error": "need source and target"}
+            result = await self.run(
+                degrees.answer, query["source"], query["target"]
+            )
+            return endpoint, 404 if "error" in result else 200, result
+        if endpoint in ("/complete", "/suggest"):
+            parameter = "prefix" if endpoint == "/complete" else "name"
+            try:
+                limit = int(query.get("limit", 10))
+            except ValueError:
+                limit = -1
+            if limit < 0:
+                return endpoint, 400, {
+                    "error": "limit must be a non-negative integer"
+                }
+            if parameter not in query:
+                return endpoint, 400, {"error": f"need {parameter}"}
+            function = (degrees.complete_name if endpoint == "/complete"
+                        else degrees.suggest_names)
+            people = await self.run(function, query[parameter], limit)
+            return endpoint, 200, {"people": people}
+        return "other", 404, {"error": f"no such endpoint: {endpoint}"}
+
+    async def run(self, function, *args):
+        """
+        Runs `function(*args)` in the worker pool.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, function, *args)
+
+    async def serve(self, host=None, port=None, path=None):
+        """
+        Serves forever on a Unix socket at `path`, or on `host`:`port`.
+        """
+        if path is not None:
+            server = await asyncio.start_unix_server(
+                self.handle, path, limit=MAX_LINE
+            )
+        else:
+            server = await asyncio.start_server(
+                self.handle, host, port, limit=MAX_LINE
+            )
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+async def _read_request(reader):
+    """
+    Reads a request line and headers, and skips past any body; returns
+    None at end of stream. A request line that is not a method, target
+    and version, or a body whose end cannot be told from its
+    Content-Length, comes back with all three set to None.
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    request_line = line.decode("latin-1").split()
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = headers.get("content-length", "0")
+    if (len(request_line) != 3 or not length.isdigit()
+            or "transfer-encoding" in headers):
+        return None, None, None, headers
+
+    # No endpoint reads a body, but it must not be taken for the next request
+    remaining = int(length)
+    while remaining:
+        chunk = await reader.read(min(remaining, MAX_LINE))
+        if not chunk:
+            raise asyncio.IncompleteReadError(b"", remaining)
+        remaining -= len(chunk)
+    method, target, version = request_line
+    return method, target, version, headers
+
+
+def _write_response(writer, status, body, keep_alive):
+    payload = json.dumps(body).encode("utf-8")
+    reason = {200: "OK", 400: "Bad Request", 404: "Not Found",
+              405: "Method Not Allowed", 500: "Internal Server Error"}[status]
+    writer.write(
+        f"HTTP/1.1 {status} {reason}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(payload)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        f"\r\n".encode("latin-1") + payload
+    )
+
+
+def _percentile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve degrees queries over HTTP from a resident graph."
+    )
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8050)
+    parser.add_argument("--unix", metavar="PATH",
+                        help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="search worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    server = Server(args.directory, args.processes)
+    where = args.unix or f"http://{args.host}:{args.port}"
+    print(f"Serving {args.directory} on {where}", file=sys.stderr)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,8 @@ import itertools
 import sys
 import math
 
+from inference import marginals
+
 PROBS = {
 
     # Unconditional probabilities for having gene
@@ -45,6 +47,28 @@ def main():
         sys.exit("Usage: python heredity.py data.csv")
     people = load_data(sys.argv[1])
 
+    # Exact gene and trait probabilities by variable elimination
+    probabilities = marginals(people, PROBS, inheritance_probability)
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                print(f"    {value}: {p:.4f}")
+
+
+def enumerate_probabilities(people):
+    """
+    Return the gene and trait probabilities of everyone in `people` by
+    summing the joint probability of every possible combination.
+
+    This takes O(6^N) joint probabilities, so it only works for small
+    families; `inference.marginals` gives the same results for any.
+    """
+
     # Keep track of gene and trait probabilities for each person
     probabilities = {
         person: {
@@ -84,15 +108,7 @@ def main():
 
     # Ensure probabilities sum to 1
     normalize(probabilities)
-
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+    return probabilities
 
 
 def load_data(filename):
@@ -163,29 +179,9 @@ def joint_probability(people, one_gene, two_genes, have_trait):
             father_number_genes = 1 if father in one_gene else 2 if father in two_genes else 0
             mother_number_genes = 1 if mother in one_gene else 2 if mother in two_genes else 0
 
-            # The probabilities of passing the gene by number of genes
-            prob_parent_give_gene = {
-                0: 0.01,
-                1: 0.49,
-                2: 0.99
-            }
-
-            # To get the probability of a child who has 0 genes
-            # There's only one scenario, none of the parents will give the gene
-            if number_genes == 0:
-                person_probability = (1 - prob_parent_give_gene[father_number_genes]) * (1 - prob_parent_give_gene[mother_number_genes])
-            # In the case of a gene there's two scenarios :
-            # The father giving the gene or the mother giving the gene
-            elif number_genes == 1:
-                # If the father is giving the gene :
-                person_probability = prob_parent_give_gene[father_number_genes] * (1 - prob_parent_give_gene[mother_number_genes])
-
-                # If the mother is giving the gene :
-                person_probability += (1 - prob_parent_give_gene[father_number_genes]) * prob_parent_give_gene[mother_number_genes]
-            # In the case of two genes there's only one scenario
-            # Both parents giving one gene
-            else :
-                person_probability = prob_parent_give_gene[father_number_genes] * prob_parent_give_gene[mother_number_genes]
+            person_probability = inheritance_probability(
+                number_genes, father_number_genes, mother_number_genes
+            )
 
             person_probability = person_probability * PROBS["trait"][number_genes][has_trait]
             people_probabilities.append(person_probability)
@@ -194,6 +190,39 @@ def joint_probability(people, one_gene, two_genes, have_trait):
     return math.prod(people_probabilities)
 
 
+def inheritance_probability(number_genes, father_number_genes,
+                            mother_number_genes):
+    """
+    Return the probability of a child having `number_genes` copies of
+    the gene, given how many copies each of their parents has.
+    """
+
+    # The probabilities of passing the gene by number of genes
+    prob_parent_give_gene = {
+        0: 0.01,
+        1: 0.49,
+        2: 0.99
+    }
+
+    # To get the probability of a child who has 0 genes
+    # There's only one scenario, none of the parents will give the gene
+    if number_genes == 0:
+        return (1 - prob_parent_give_gene[father_number_genes]) * (1 - prob_parent_give_gene[mother_number_genes])
+    # In the case of a gene there's two scenarios :
+    # The father giving the gene or the mother giving the gene
+    elif number_genes == 1:
+        # If the father is giving the gene :
+        probability = prob_parent_give_gene[father_number_genes] * (1 - prob_parent_give_gene[mother_number_genes])
+
+        # If the mother is giving the gene :
+        probability += (1 - prob_parent_give_gene[father_number_genes]) * prob_parent_give_gene[mother_number_genes]
+        return probability
+    # In the case of two genes there's only one scenario
+    # Both parents giving one gene
+    else :
+        return prob_parent_give_gene[father_number_genes] * prob_parent_give_gene[mother_number_genes]
+
+
 def update(probabilities, one_gene, two_genes, have_trait, p):
     """
     Add to `probabilities` a new joint probability `p`.
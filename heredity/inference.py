@@ -0,0 +1,206 @@
+import itertools
+
+# Copies of the gene a person can have
+GENES = (0, 1, 2)
+
+
+def marginals(people, probs, inheritance):
+    """
+    Return the gene and trait distribution of every person in `people`
+    (as loaded by heredity.load_data), given the traits that are known.
+
+    The family is treated as a Bayesian network over each person's
+    number of genes: people without both parents listed draw theirs
+    from `probs["gene"]`, everyone else from their parents' through
+    `inheritance(genes, father_genes, mother_genes)`, and a known trait
+    weighs each person's genes by `probs["trait"]`. Genes are eliminated
+    one person at a time in min-fill order, which builds a tree of
+    cliques over the family, and passing messages up and down that tree
+    gives every person's distribution exactly in two passes. The work
+    grows with 3 to the size of the largest clique, which stays small
+    unless relatives have children together.
+
+    Return a dictionary shaped like heredity.enumerate_probabilities's,
+    with each distribution normalized.
+    """
+    factors = []
+    for name, person in people.items():
+        trait = person["trait"]
+        weights = [
+            probs["trait"][genes][trait] if trait is not None else 1.0
+            for genes in GENES
+        ]
+        mother, father = person["mother"], person["father"]
+        if not mother or not father:
+            factors.append(((name,), [
+                probs["gene"][genes] * weights[genes] for genes in GENES
+            ]))
+        else:
+            factors.append(((name, father, mother), [
+                inheritance(genes, father_genes, mother_genes) * weights[genes]
+                for genes, father_genes, mother_genes
+                in itertools.product(GENES, repeat=3)
+            ]))
+
+    order, cliques = _elimination_order(people, factors)
+    position = {name: i for i, name in enumerate(order)}
+
+    # Each clique hangs off the clique of the next variable eliminated
+    # among its own, and each factor goes to its first eliminated variable
+    parent = {}
+    children = {name: [] for name in order}
+    for name in order:
+        rest = cliques[name] - {name}
+        if rest:
+            parent[name] = min(rest, key=position.get)
+            children[parent[name]].append(name)
+    assigned = {name: [] for name in order}
+    for factor in factors:
+        assigned[min(factor[0], key=position.get)].append(factor)
+
+    def separator(name):
+        return tuple(sorted(cliques[name] - {name}, key=position.get))
+
+    def scope(name):
+        return tuple(sorted(cliques[name], key=position.get))
+
+    # Upward pass: exactly variable elimination in `order`
+    up = {}
+    for name in order:
+        clique = _product(
+            assigned[name] + [up[child] for child in children[name]],
+            scope(name)
+        )
+        up[name] = _marginal(clique, separator(name))
+
+    # Downward pass, then each person's belief over their own genes.
+    # Each child is sent the product of everything else that reached the
+    # clique, built up from either end of the list of children, so that
+    # no message ever has to be divided back out.
+    down = {}
+    probabilities = {}
+    for name in reversed(order):
+        messages = [up[child] for child in children[name]]
+        before = [_product(
+            assigned[name] + ([down[name]] if name in down else []),
+            scope(name)
+        )]
+        for message in messages:
+            before.append(_product([before[-1], message], scope(name)))
+        after = _product([], scope(name))
+        for i in reversed(range(len(messages))):
+            child = children[name][i]
+            down[child] = _marginal(
+                _product([before[i], after], scope(name)), separator(child)
+            )
+            after = _product([after, messages[i]], scope(name))
+        _, belief = _marginal(before[-1], (name,))
+
+        trait = people[name]["trait"]
+        if trait is None:
+            has_trait = sum(
+                belief[genes] * probs["trait"][genes][True] for genes in GENES
+            )
+        else:
+            has_trait = 1.0 if trait else 0.0
+        probabilities[name] = {
+            "gene": {genes: belief[genes] for genes in reversed(GENES)},
+            "trait": {True: has_trait, False: 1 - has_trait}
+        }
+    return {name: probabilities[name] for name in people}
+
+
+def _elimination_order(people, factors):
+    """
+    Return a greedy min-fill elimination order of everyone in `people`,
+    and the clique each person forms with their neighbours when they
+    are eliminated.
+    """
+    neighbors = {name: set() for name in people}
+    for variables, _ in factors:
+        for a, b in itertools.combinations(variables, 2):
+            neighbors[a].add(b)
+            neighbors[b].add(a)
+
+    def fill(name):
+        return sum(
+            1 for a, b in itertools.combinations(neighbors[name], 2)
+            if b not in neighbors[a]
+        )
+
+    fills = {name: fill(name) for name in people}
+    order = []
+    cliques = {}
+    while fills:
+        name = min(fills, key=lambda n: (fills[n], len(neighbors[n]), n))
+        cliques[name] = {name} | neighbors[name]
+        for a, b in itertools.combinations(neighbors[name], 2):
+            neighbors[a].add(b)
+            neighbors[b].add(a)
+        for neighbor in neighbors[name]:
+            neighbors[neighbor].discard(name)
+        # Only people within two steps of the one eliminated need rescoring
+        affected = set(neighbors[name])
+        for neighbor in neighbors[name]:
+            affected.update(neighbors[neighbor])
+        del neighbors[name]
+        del fills[name]
+        affected.discard(name)
+        for other in affected:
+            fills[other] = fill(other)
+        order.append(name)
+    return order, cliques
+
+
+def _product(factors, scope):
+    """
+    Return the product of `factors` as a factor over `scope`, which
+    holds every variable they mention.
+
+    A factor is a (variables, values) pair, with one value per
+    assignment of genes to its variables, the last varying fastest. The
+    product is rescaled to sum to 1 after every factor, so that many
+    small ones multiplied together do not underflow.
+    """
+    values = [1.0] * len(GENES) ** len(scope)
+    for variables, factor in factors:
+        _, values = _normalized(scope, [
+            value * factor[index]
+            for value, index in zip(values, _indexes(scope, variables))
+        ])
+    return scope, values
+
+
+def _marginal(factor, keep):
+    """
+    Return `factor` summed over every variable not in `keep`, scaled to
+    sum to 1 so that long chains of small probabilities do not underflow.
+    """
+    variables, values = factor
+    result = [0.0] * len(GENES) ** len(keep)
+    for value, index in zip(values, _indexes(variables, keep)):
+        result[index] += value
+    return _normalized(keep, result)
+
+
+def _normalized(variables, values):
+    total = sum(values)
+    return variables, [value / total for value in values]
+
+
+def _indexes(scope, variables):
+    """
+    Return, for every assignment to `scope` in order, the position of
+    the matching value in a factor over `variables` (a subset of it).
+    """
+    size = len(GENES)
+    strides = {
+        variable: size ** (len(variables) - 1 - i)
+        for i, variable in enumerate(variables)
+    }
+    indexes = [0]
+    for variable in scope:
+        stride = strides.get(variable, 0)
+        indexes = [index + genes * stride
+                   for index in indexes for genes in GENES]
+    return indexes
@@ -0,0 +1,180 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+
+import pagerank
+
+# Damping factor every run uses
+DAMPING = 0.85
+
+# Tolerance of the reference ranks the others are measured against
+REFERENCE_TOLERANCE = 1e-14
+
+# Most links a generated page can have
+MAX_LINKS = 200
+
+
+def generate(directory, size, seed, dangling=0.1, components=1):
+    """
+    Writes a corpus of `size` HTML pages to `directory`.
+
+    The number of links on a page follows a Pareto (power-law)
+    distribution and links favour low-numbered pages, so a few pages
+    gather most of the links, as on the web. A `dangling` fraction of
+    pages has no links at all, and the pages are split into
+    `components` groups that never link to each other.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    group = -(-size // components)
+    for page in range(size):
+        start = page // group * group
+        members = min(group, size - start)
+        links = set()
+        if rng.random() >= dangling and members > 1:
+            count = min(MAX_LINKS, int(rng.paretovariate(1.5)))
+            for _ in range(count):
+                link = start + int(members * rng.random() ** 2)
+                if link != page:
+                    links.add(link)
+        with open(os.path.join(directory, f"{page}.html"), "w",
+                  encoding="utf-8") as f:
+            f.write(f"<!DOCTYPE html>\n<html>\n<head><title>{page}</title>"
+                    "</head>\n<body>\n")
+            f.write(f"<h1>Page {page}</h1>\n")
+            for link in sorted(links):
+                f.write(f'<div><a href="{link}.html">Page {link}</a></div>\n')
+            f.write("</body>\n</html>\n")
+
+
+def reference(directory):
+    """
+    Returns ranks of the corpus in `directory` converged to
+    REFERENCE_TOLERANCE, computing them once and keeping them beside it.
+    """
+    path = os.path.normpath(directory) + ".reference.json"
+    if os.path.exists(path):
+        return pagerank.read_ranks(path)
+    corpus = pagerank.crawl(directory)
+    ranks = pagerank.iterate_pagerank(
+        corpus, DAMPING, REFERENCE_TOLERANCE, max_iterations=100000
+    )
+    pagerank.write_ranks(path, ranks)
+    return ranks
+
+
+def run(directory, mode, setting, seed):
+    """
+    Times `mode` ("crawl", "sample" with `setting` samples or "iterate"
+    with `setting` as tolerance) on the corpus in `directory`. Meant to
+    run in a fresh process so the peak RSS it reports belongs to this
+    run alone.
+    """
+    started = time.perf_counter()
+    corpus = pagerank.crawl(directory)
+    crawled = time.perf_counter() - started
+    result = {"mode": mode, "pages": len(corpus),
+              "links": sum(len(links) for links in corpus.values())}
+    if mode == "crawl":
+        result["wall_s"] = round(crawled, 6)
+    else:
+        started = time.perf_counter()
+        if mode == "sample":
+            ranks = pagerank.sample_pagerank(corpus, DAMPING, setting,
+                                             seed=seed)
+            result["samples"] = setting
+        else:
+            iterations = []
+            ranks = pagerank.iterate_pagerank(corpus, DAMPING, setting,
+                                              callback=iterations.append)
+            result["tolerance"] = setting
+            result["iterations"] = len(iterations)
+        result["wall_s"] = round(time.perf_counter() - started, 6)
+        exact = reference(directory)
+        result["l1_error"] = sum(
+            abs(ranks[page] - exact[page]) for page in exact
+        )
+    result["peak_rss_kb"] = _peak_rss_kb()
+    return result
+
+
+def benchmark(sizes, samples, tolerances, seed, workdir, dangling,
+              components):
+    """
+    Yields one result per (size, mode, setting), generating data as
+    needed.
+    """
+    context = multiprocessing.get_context("spawn")
+    runs = ([("crawl", None)] + [("sample", n) for n in samples]
+            + [("iterate", tolerance) for tolerance in tolerances])
+    for size in sizes:
+        directory = os.path.join(
+            workdir,
+            f"pages-{size}-seed-{seed}-dangling-{dangling}-"
+            f"components-{components}"
+        )
+        if not os.path.exists(os.path.join(directory, f"{size - 1}.html")):
+            generate(directory, size, seed, dangling, components)
+        with context.Pool(1) as pool:
+            pool.apply(reference, (directory,))
+        for mode, setting in runs:
+            with context.Pool(1) as pool:
+                result = pool.apply(run, (directory, mode, setting, seed))
+            result.update({"size": size, "seed": seed, "dangling": dangling,
+                           "components": components})
+            yield result
+
+
+def _peak_rss_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark pagerank on synthetic scale-free corpora."
+    )
+    parser.add_argument("--pages", type=int, nargs="+",
+                        default=[1000, 10000, 100000, 1000000],
+                        help="corpus sizes to generate, one run per value")
+    parser.add_argument("--samples", type=int, nargs="+",
+                        default=[10000, 100000, 1000000],
+                        help="sample counts to run sample_pagerank with")
+    parser.add_argument("--tolerances", type=float, nargs="+",
+                        default=[1e-4, 1e-6, 1e-8],
+                        help="tolerances to run iterate_pagerank with")
+    parser.add_argument("--dangling", type=float, default=0.1,
+                        help="fraction of pages without links")
+    parser.add_argument("--components", type=int, default=1,
+                        help="groups of pages that never link to each other")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workdir", default=os.path.join(
+        tempfile.gettempdir(), "pagerank-benchmark"
+    ), help="where generated corpora are kept between runs")
+    parser.add_argument("--output", help="write JSON lines here, not stdout")
+    args = parser.parse_args()
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    header = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count()
+    }
+    with output:
+        for result in benchmark(args.pages, args.samples, args.tolerances,
+                                args.seed, args.workdir, args.dangling,
+                                args.components):
+            result.update(header)
+            print(json.dumps(result), file=output, flush=True)
+
+
+if __name__ == "__main__":
+    main()
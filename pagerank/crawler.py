@@ -0,0 +1,210 @@
+import codecs
+import json
+import multiprocessing
+import os
+import re
+
+# Bump whenever the crawl cache layout changes so old files are ignored
+CACHE_VERSION = 1
+
+# Same pattern crawl has always used to find links
+LINK = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Bytes read from a page at a time
+CHUNK_SIZE = 64 * 1024
+
+# Longest unfinished tag carried over from one chunk to the next
+MAX_CARRY = 64 * 1024
+
+# Files a worker process parses per task
+BATCH_SIZE = 256
+
+
+def page_links(path, chunk_size=CHUNK_SIZE):
+    """
+    Returns the set of links found on the HTML page at `path`.
+
+    A page shorter than `chunk_size` bytes is searched in one go. A
+    longer one is read and decoded `chunk_size` bytes at a time, and only
+    the text from the last unfinished tag of a chunk is carried into the
+    next one, so a link split across two chunks is still found but the
+    whole page is never held in memory.
+    """
+    with open(path, "rb") as f:
+        data = f.read(chunk_size)
+        if len(data) < chunk_size:
+            return set(LINK.findall(data.decode("utf-8", "replace")))
+
+        decode = codecs.getincrementaldecoder("utf-8")("replace").decode
+        links = set()
+        carry = ""
+        while data:
+            buffer = carry + decode(data)
+
+            # A tag opened after `cut` may still be going on in the next chunk
+            cut = buffer.rfind("<")
+            if cut == -1:
+                cut = len(buffer)
+            end = 0
+            for match in LINK.finditer(buffer, 0, cut):
+                links.add(match.group(1))
+                end = match.end()
+            carry = buffer[max(cut, end):][-MAX_CARRY:]
+            data = f.read(chunk_size)
+    links.update(LINK.findall(carry + decode(b"", True)))
+    return links
+
+
+class CrawlCache():
+    """
+    Links found on each page of a corpus directory, kept in a file next
+    to it and keyed by each page's size and mtime, so that a re-crawl
+    only parses the pages that changed since the last one.
+
+    `pages` is the corpus in `crawl` form. `update` brings it up to date
+    in place: pages whose links were re-parsed, and pages linking to a
+    page that was added or removed, have their link sets replaced, and
+    every other entry is left untouched. `report` counts the files
+    reused, re-parsed and removed by the last update.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.normpath(directory) + ".crawl"
+        # Filename to (size, mtime_ns, links), links still unfiltered
+        self.entries = _read_cache(self.path)
+        self.pages = None
+        self.report = {"reused": 0, "parsed": 0, "removed": 0}
+
+    def update(self, processes=1):
+        """
+        Re-crawls the directory, parsing on `processes` processes as
+        `scan_corpus` does, and returns the updated `pages`.
+        """
+        stamps = {
+            entry.name: (stat.st_size, stat.st_mtime_ns)
+            for entry in _html_files(self.directory)
+            for stat in (entry.stat(),)
+        }
+        removed = [page for page in self.entries if page not in stamps]
+        changed = [
+            page for page, stamp in sorted(stamps.items())
+            if self.entries.get(page, (None, None))[:2] != stamp
+        ]
+        added = set(page for page in changed if page not in self.entries)
+        for page in removed:
+            del self.entries[page]
+        for page, links in _scan(self.directory, changed, processes):
+            self.entries[page] = stamps[page] + (links,)
+        self.report = {
+            "reused": len(stamps) - len(changed),
+            "parsed": len(changed),
+            "removed": len(removed)
+        }
+
+        if self.pages is None:
+            self.pages = dict()
+            stale = self.entries
+        else:
+            for page in removed:
+                del self.pages[page]
+            # Pages are only dropped from or added to link sets by name
+            moved = added.union(removed)
+            stale = set(changed)
+            if moved:
+                stale.update(
+                    page for page, (_, _, links) in self.entries.items()
+                    if not moved.isdisjoint(links)
+                )
+        for page in stale:
+            self.pages[page] = set(
+                link for link in self.entries[page][2]
+                if link in self.entries
+            )
+
+        if changed or removed:
+            try:
+                self.save()
+            except OSError:
+                pass
+        return self.pages
+
+    def save(self):
+        """
+        Writes the entries to the cache file, replacing it atomically.
+        """
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": CACHE_VERSION,
+                "pages": {
+                    page: [size, mtime, sorted(links)]
+                    for page, (size, mtime, links) in self.entries.items()
+                }
+            }, f)
+        os.replace(temporary, self.path)
+
+
+def scan_corpus(directory, processes=1):
+    """
+    Yields (page, links) for every .html file in `directory`, in order
+    of filename. Links to the page itself are left out.
+
+    With `processes` other than 1 (None for one per core), the files are
+    parsed in batches of BATCH_SIZE on a pool of worker processes, since
+    parsing holds the GIL and threads could not share it out. A corpus of
+    a single batch is always parsed here, as starting workers would take
+    longer.
+    """
+    filenames = sorted(entry.name for entry in _html_files(directory))
+    yield from _scan(directory, filenames, processes)
+
+
+def _scan(directory, filenames, processes):
+    processes = processes or multiprocessing.cpu_count()
+    if processes == 1 or len(filenames) <= BATCH_SIZE:
+        yield from _scan_batch((directory, filenames))
+        return
+
+    batches = [
+        (directory, filenames[i:i + BATCH_SIZE])
+        for i in range(0, len(filenames), BATCH_SIZE)
+    ]
+    with multiprocessing.Pool(processes) as pool:
+        for scanned in pool.imap(_scan_batch, batches):
+            yield from scanned
+
+
+def _scan_batch(batch):
+    directory, filenames = batch
+    scanned = []
+    for filename in filenames:
+        links = page_links(os.path.join(directory, filename))
+        links.discard(filename)
+        scanned.append((filename, links))
+    return scanned
+
+
+def _html_files(directory):
+    return [
+        entry for entry in os.scandir(directory)
+        if entry.name.endswith(".html") and entry.is_file()
+    ]
+
+
+def _read_cache(path):
+    """
+    Returns the entries stored at `path`, or none if the file is
+    missing, unreadable or from another version.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(stored, dict) or stored.get("version") != CACHE_VERSION:
+        return {}
+    return {
+        page: (size, mtime, set(links))
+        for page, (size, mtime, links) in stored["pages"].items()
+    }
@@ -0,0 +1,216 @@
+import array
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+# Bump whenever the link file layout changes so old files are rejected
+LINK_FILE_VERSION = 1
+LINK_FILE_MAGIC = b"PRLINKS\0"
+
+# Sections in the order they are laid out in a link file
+SECTIONS = ("name_offsets", "name_data", "out_degrees",
+            "in_offsets", "in_sources")
+
+# Links buffered in memory, and read back at a time, while writing a file
+LINK_BATCH = 1 << 20
+
+
+class PageTable():
+    """
+    Read-only sequence of page names stored as one UTF-8 blob plus an
+    array of offsets into it, instead of one Python object per name.
+    """
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return str(self.data[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class LinkFile():
+    """
+    Link structure of a corpus memory-mapped from a link file, for
+    corpora too big to crawl into a dictionary.
+
+    Pages are interned to dense integers in sorted name order, as in a
+    LinkGraph, with their names in `pages`. The links are only kept
+    pointing backwards, in CSR form: page `p` is linked to by
+    `in_sources[in_offsets[p]:in_offsets[p + 1]]`, and `out_degrees[p]`
+    counts its own links. All of these point straight into the mapping,
+    so the operating system pages them in and out as they are read.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = _header_format()
+        if len(self.buffer) < struct.calcsize(header):
+            raise ValueError(f"{path} is not a link file")
+        fields = struct.unpack_from(header, self.buffer)
+        magic, version, little = fields[:3]
+        if (magic != LINK_FILE_MAGIC or version != LINK_FILE_VERSION
+                or little != (sys.byteorder == "little")):
+            raise ValueError(f"{path} is not a link file for this version")
+
+        view = memoryview(self.buffer)
+        layout = fields[5:]
+        name_offsets, name_data, out_degrees, in_offsets, in_sources = (
+            view[offset:offset + length]
+            for offset, length in zip(layout[::2], layout[1::2])
+        )
+        self.pages = PageTable(name_offsets.cast("q"), name_data)
+        self.out_degrees = out_degrees.cast("i")
+        self.in_offsets = in_offsets.cast("q")
+        self.in_sources = in_sources.cast("i")
+
+    def __len__(self):
+        return len(self.out_degrees)
+
+    def out_degree(self, page):
+        """
+        Returns the number of links on page index `page`.
+        """
+        return self.out_degrees[page]
+
+    def backlinks(self, page):
+        """
+        Returns the indexes of the pages that link to page index `page`.
+        """
+        return self.in_sources[self.in_offsets[page]:self.in_offsets[page + 1]]
+
+    def ranks(self, values):
+        """
+        Returns a dictionary of page name to the matching item of `values`.
+        """
+        return dict(zip(self.pages, values))
+
+
+def write_link_file(path, records):
+    """
+    Write the corpus streamed as (page, links) records, such as the ones
+    `crawler.scan_corpus` yields, to a link file at `path`.
+
+    Only the page names and a few integers per page are kept in memory.
+    Links are spilled to a temporary file as they arrive, counted per
+    page on a second read, and scattered into place on a third, straight
+    into the mapped output file. Links to pages that never get a record
+    of their own are dropped, as `crawl` does.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    names = {}
+    seen = bytearray()
+    with tempfile.TemporaryFile(dir=directory) as spill:
+        batch = array.array("i")
+        for page, links in records:
+            source = names.setdefault(page, len(names))
+            for link in links:
+                if link != page:
+                    batch.append(source)
+                    batch.append(names.setdefault(link, len(names)))
+            if len(seen) < len(names):
+                seen.extend(bytes(len(names) - len(seen)))
+            seen[source] = 1
+            if len(batch) >= 2 * LINK_BATCH:
+                batch.tofile(spill)
+                del batch[:]
+        batch.tofile(spill)
+        del batch
+
+        # Renumber the pages with records in sorted order
+        pages = sorted(page for page, i in names.items()
+                       if i < len(seen) and seen[i])
+        renumber = array.array("i", [-1]) * len(names)
+        for i, page in enumerate(pages):
+            renumber[names[page]] = i
+        del names, seen
+        size = len(pages)
+
+        out_degrees = array.array("i", [0]) * size
+        in_offsets = array.array("q", [0]) * (size + 1)
+        for source, target in _spilled(spill, renumber):
+            out_degrees[source] += 1
+            in_offsets[target + 1] += 1
+        for i in range(size):
+            in_offsets[i + 1] += in_offsets[i]
+
+        name_offsets = array.array("q", [0])
+        name_data = bytearray()
+        for page in pages:
+            name_data += page.encode("utf-8")
+            name_offsets.append(len(name_data))
+        del pages
+
+        buffers = [name_offsets, name_data, out_degrees, in_offsets]
+        lengths = [len(memoryview(b).cast("B")) for b in buffers]
+        lengths.append(in_offsets[size] * out_degrees.itemsize)
+        position = _align(struct.calcsize(_header_format()))
+        layout = []
+        for length in lengths:
+            layout.extend((position, length))
+            position = _align(position + length)
+
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w+b") as f:
+            f.write(struct.pack(
+                _header_format(), LINK_FILE_MAGIC, LINK_FILE_VERSION,
+                sys.byteorder == "little", size, in_offsets[size], *layout
+            ))
+            for offset, buffer in zip(layout[::2], buffers):
+                f.write(b"\0" * (offset - f.tell()))
+                f.write(memoryview(buffer).cast("B"))
+            f.truncate(max(position, 1))
+
+            # Scatter each link into its target's slot in the mapped file
+            if in_offsets[size]:
+                with mmap.mmap(f.fileno(), 0) as mapped:
+                    offset, length = layout[-2:]
+                    in_sources = memoryview(mapped)[
+                        offset:offset + length
+                    ].cast("i")
+                    cursor = in_offsets[:-1]
+                    for source, target in _spilled(spill, renumber):
+                        in_sources[cursor[target]] = source
+                        cursor[target] += 1
+                    in_sources.release()
+                    mapped.flush()
+    os.replace(temporary, path)
+
+
+def _spilled(spill, renumber):
+    """
+    Yields the (source, target) links spilled to `spill`, renumbered,
+    leaving out links to pages without a record.
+    """
+    spill.seek(0)
+    while True:
+        batch = array.array("i")
+        batch.frombytes(spill.read(2 * LINK_BATCH * batch.itemsize))
+        if not batch:
+            return
+        for i in range(0, len(batch), 2):
+            target = renumber[batch[i + 1]]
+            if target >= 0:
+                yield renumber[batch[i]], target
+
+
+def _header_format():
+    return f"<8sI?qq{len(SECTIONS) * 2}q"
+
+
+def _align(position):
+    return (position + 7) & ~7
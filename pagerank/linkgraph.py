@@ -0,0 +1,110 @@
+import array
+
+
+class LinkGraph():
+    """
+    Link structure of a corpus with pages interned to dense integers.
+
+    `pages` holds the page names in sorted order and `index` maps a name
+    back to its position. Links are kept in CSR form in both directions:
+    page `p` links to `out_targets[out_offsets[p]:out_offsets[p + 1]]`
+    and is linked to by `in_sources[in_offsets[p]:in_offsets[p + 1]]`.
+    """
+
+    def __init__(self, pages, out_offsets, out_targets,
+                 in_offsets, in_sources):
+        self.pages = pages
+        self.index = {page: i for i, page in enumerate(pages)}
+        self.out_offsets = out_offsets
+        self.out_targets = out_targets
+        self.in_offsets = in_offsets
+        self.in_sources = in_sources
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Builds a LinkGraph from a `crawl` dictionary of page to the set of
+        pages it links to. Links to pages outside the corpus are dropped.
+        """
+        return cls.from_records(corpus.items())
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Builds a LinkGraph from an iterable of (page, links) records, such
+        as the one `crawler.scan_corpus` streams. Each page's links are
+        interned as its record arrives; links to pages that never get a
+        record of their own are dropped at the end.
+        """
+        names = {}
+        seen = set()
+        sources = array.array("i")
+        targets = array.array("i")
+        for page, links in records:
+            source = names.setdefault(page, len(names))
+            seen.add(source)
+            for link in links:
+                if link != page:
+                    sources.append(source)
+                    targets.append(names.setdefault(link, len(names)))
+
+        # Renumber the pages with records in sorted order
+        pages = sorted(page for page, i in names.items() if i in seen)
+        renumber = {names[page]: i for i, page in enumerate(pages)}
+        links = sorted(set(
+            (renumber[source], renumber[target])
+            for source, target in zip(sources, targets)
+            if target in renumber
+        ))
+        out_offsets, out_targets = _csr(len(pages), links)
+        in_offsets, in_sources = _csr(
+            len(pages), sorted((target, source) for source, target in links)
+        )
+        return cls(pages, out_offsets, out_targets, in_offsets, in_sources)
+
+    def __len__(self):
+        return len(self.pages)
+
+    def out_degree(self, page):
+        """
+        Returns the number of links on page index `page`.
+        """
+        return self.out_offsets[page + 1] - self.out_offsets[page]
+
+    def links(self, page):
+        """
+        Returns the indexes of the pages that page index `page` links to.
+        """
+        return self.out_targets[self.out_offsets[page]:self.out_offsets[page + 1]]
+
+    def backlinks(self, page):
+        """
+        Returns the indexes of the pages that link to page index `page`.
+        """
+        return self.in_sources[self.in_offsets[page]:self.in_offsets[page + 1]]
+
+    def dangling(self):
+        """
+        Returns the indexes of the pages with no links.
+        """
+        return [p for p in range(len(self.pages)) if not self.out_degree(p)]
+
+    def ranks(self, values):
+        """
+        Returns a dictionary of page name to the matching item of `values`.
+        """
+        return dict(zip(self.pages, values))
+
+
+def _csr(size, pairs):
+    """
+    Returns (offsets, targets) arrays for `size` sources from a list of
+    (source, target) pairs sorted by source.
+    """
+    offsets = array.array("q", [0]) * (size + 1)
+    targets = array.array("i", (target for _, target in pairs))
+    for source, _ in pairs:
+        offsets[source + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+    return offsets, targets
@@ -1,10 +1,19 @@
+import json
 import os
 import random
-import re
 import sys
 
 import pdb
 
+from crawler import scan_corpus
+from linkfile import LinkFile
+from linkgraph import LinkGraph
+from personalized import teleport_distribution
+from sampling import WALKERS, parallel_sample_counts, sample_counts
+from solvers import (MAX_ITERATIONS, SOLVERS, TOLERANCE, block_iteration,
+                     power_iteration, push)
+from transition import link_probabilities, materialize
+
 DAMPING = 0.85
 SAMPLES = 10000
 
@@ -23,22 +32,26 @@ def main():
         print(f"  {page}: {ranks[page]:.4f}")
 
 
-def crawl(directory):
+def crawl(directory, processes=1, cache=None):
     """
     Parse a directory of HTML pages and check for links to other pages.
     Return a dictionary where each key is a page, and values are
     a list of all other pages in the corpus that are linked to by the page.
+
+    With `processes` other than 1 (None for one per core), the files
+    are parsed on a pool of worker processes. With a `cache` (a
+    crawler.CrawlCache for `directory`), only pages changed since the
+    last crawl are parsed and the cache's dictionary is updated in place
+    and returned.
     """
+    if cache is not None:
+        return cache.update(processes)
+
     pages = dict()
 
     # Extract all links from HTML files
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
-            continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
+    for filename, links in scan_corpus(directory, processes):
+        pages[filename] = links
 
     # Only include links to other pages in the corpus
     for filename in pages:
@@ -58,33 +71,19 @@ def transition_model(corpus, page, damping_factor):
     With probability `damping_factor`, choose a link at random
     linked to by `page`. With probability `1 - damping_factor`, choose
     a link at random chosen from all pages in the corpus.
-    """
-    pages_probabilities = {}
-    num_links = len(corpus[page])
-
-    # Page has no outgoing links
-    if not num_links:
-        # Calculate the probability
-        equal_probability = 1 / len(corpus)
-        for p in corpus:
-            pages_probabilities[p] = equal_probability
-        return pages_probabilities
-
-    # Page has outgoing links
-    # Get the probability for each page
-    probability = damping_factor / len(corpus[page])
-
-    # Get the probability of choosing randomly among all pages
-    remainder = (1 - damping_factor) / len(corpus)
 
-    # Assigning the probabilities
-    for p in corpus :
-        pages_probabilities[p] = remainder + probability if p in corpus[page] else remainder
-    
-    return pages_probabilities
+    The dictionary is the caller's to change, and reflects the corpus
+    as it is now, so it is built afresh on every call. To ask for many
+    pages of a corpus that stays the same, build a
+    transition.TransitionModel once instead.
+    """
+    follow, jump = link_probabilities(len(corpus), len(corpus[page]),
+                                      damping_factor)
+    return materialize(corpus, corpus[page], follow, jump)
 
 
-def sample_pagerank(corpus, damping_factor, n):
+def sample_pagerank(corpus, damping_factor, n, walkers=WALKERS, seed=None,
+                    processes=1):
     """
     Return PageRank values for each page by sampling `n` pages
     according to transition model, starting with a page at random.
@@ -92,31 +91,27 @@ def sample_pagerank(corpus, damping_factor, n):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    The samples are drawn by up to `walkers` independent random
+    surfers (see `sample_counts`) in O(1) each; `seed` makes the
+    estimate reproducible. With `processes` other than 1 (None for one
+    per core), the samples are split across that many worker processes,
+    each with its own seeded generator.
     """
-    results = {}
-
-    # Initializing the current results to 0
-    for page in corpus :
-        results[page] = 0
-        
-    # first randomly choose a page
-    page = random.choice(list(corpus.keys()))
-    results[page] = 1 
-
-    for g in range(1, n):
-        p_dist = transition_model(corpus, page, damping_factor)
-        # based on the old distribution get a new page
-        page = random.choices(list(p_dist.keys()), list(p_dist.values()), k=1)[0]
-        results[page] += 1
-        
-    # Normalize the results
-    for page in results:
-        results[page] /= n
-    
-    return results 
-
-
-def iterate_pagerank(corpus, damping_factor):
+    graph = LinkGraph.from_corpus(corpus)
+    if processes == 1:
+        rng = random.Random(seed) if seed is not None else random
+        counts = sample_counts(graph, damping_factor, n, walkers, rng)
+    else:
+        counts = parallel_sample_counts(
+            graph, damping_factor, n, walkers, seed, processes
+        )
+    return graph.ranks(count / n for count in counts)
+
+
+def iterate_pagerank(corpus, damping_factor, tolerance=TOLERANCE,
+                     max_iterations=MAX_ITERATIONS, previous=None,
+                     solver="power", callback=None):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
@@ -124,41 +119,83 @@ def iterate_pagerank(corpus, damping_factor):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    The corpus is turned into a sparse link matrix and `solver` runs
+    until the ranks change by less than `tolerance` in L1 norm: one of
+    "power" (power iteration), "jacobi", "gauss-seidel", or "quadratic"
+    for power iteration with quadratic extrapolation. If given,
+    `callback` gets a dictionary after every sweep with its "iteration",
+    "residual" (the L1 change), "elapsed_s" and the number of pages
+    still "changing".
+
+    Given the `previous` ranks of an earlier version of the corpus (as
+    returned by this function or `read_ranks`), they are corrected by
+    pushing residuals from the pages the changes affected instead, which
+    after a small change is much cheaper than starting over.
+
+    `corpus` may also be a linkfile.LinkFile, for corpora too big to
+    hold in memory; its links are then read from disk one block of
+    pages at a time and only the rank vectors stay resident.
+    """
+    if solver not in SOLVERS:
+        raise ValueError(f"unknown solver: {solver}")
+    if isinstance(corpus, LinkFile):
+        if previous is not None or solver != "power":
+            raise ValueError("link files only support cold power iteration")
+        return corpus.ranks(block_iteration(
+            corpus, damping_factor, tolerance, max_iterations,
+            callback=callback
+        ))
+
+    graph = LinkGraph.from_corpus(corpus)
+    if previous is None:
+        ranks = SOLVERS[solver](graph, damping_factor, tolerance,
+                                max_iterations, callback=callback)
+    else:
+        # New pages start from an even share; ranks needn't sum to 1 yet
+        initial = [previous.get(page, 1 / len(graph)) for page in graph.pages]
+        ranks = push(graph, damping_factor, initial, tolerance, max_iterations,
+                     callback)
+    return graph.ranks(ranks)
+
+
+def personalized_pagerank(corpus, damping_factor, teleport,
+                          tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS):
+    """
+    Return PageRank values for each page for a surfer who, instead of
+    jumping to a page chosen uniformly, jumps according to `teleport`:
+    a page, a list of pages to pick from uniformly, or a dictionary of
+    page to weight.
+
+    Return a dictionary where keys are page names, and values are
+    their PageRank value. All PageRank values should sum to 1.
+
+    For many queries over the same corpus, personalized.PersonalizedPageRank
+    keeps the link graph and caches results.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    ranks = power_iteration(graph, damping_factor, tolerance, max_iterations,
+                            teleport_distribution(graph, teleport))
+    return graph.ranks(ranks)
+
+
+def write_ranks(path, ranks):
+    """
+    Save a dictionary of PageRank values to `path` for a later
+    `iterate_pagerank(..., previous=read_ranks(path))`.
+    """
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(ranks, f)
+    os.replace(temporary, path)
+
+
+def read_ranks(path):
+    """
+    Return the PageRank values saved at `path` by `write_ranks`.
     """
-    N = len(corpus)
-
-    # 1 / N
-    starting_rank = 1 / N
-
-    # Assigning each page the starting_rank
-    page_ranks = {}
-
-    for page in corpus :
-        page_ranks[page] = starting_rank
-
-    run = True
-
-    while run:
-        count = 0
-        for page in corpus:
-            page_rank = (1 - damping_factor) / N
-            sigma = 0
-            for i in corpus:
-                if page in corpus[i]:
-                    num_links = len(corpus[i])
-                    sigma = sigma + page_ranks[i] / num_links
-            sigma = damping_factor * sigma
-            page_rank += sigma
-            if abs(page_rank - page_ranks[page]) < 0.00001:
-                count += 1
-            # If the difference is less than the threshold
-            # Assign the new page_rank
-            page_ranks[page] = page_rank
-            if count == N:
-                run = False
-                break
-
-    return page_ranks
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,101 @@
+import collections
+
+from linkgraph import LinkGraph
+from solvers import (MAX_ITERATIONS, PUSH_TOLERANCE, TOLERANCE, local_push,
+                     power_iteration)
+
+# Personalized rankings kept by a PersonalizedPageRank
+CACHE_SIZE = 1024
+
+
+class PersonalizedPageRank():
+    """
+    Personalized PageRank over one corpus, for answering many seed sets.
+
+    The corpus is turned into a LinkGraph once. A ranking for a single
+    seed page comes from a local push approximation, which only touches
+    the pages near the seed; any other teleport distribution is solved
+    exactly by power iteration. The last `cache_size` rankings are kept
+    in an LRU cache keyed by seed set.
+    """
+
+    def __init__(self, corpus, damping_factor, cache_size=CACHE_SIZE,
+                 tolerance=TOLERANCE, push_tolerance=PUSH_TOLERANCE):
+        self.graph = LinkGraph.from_corpus(corpus)
+        self.damping_factor = damping_factor
+        self.cache_size = cache_size
+        self.tolerance = tolerance
+        self.push_tolerance = push_tolerance
+        self.results = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def ranks(self, teleport):
+        """
+        Returns the personalized PageRank of the pages as a dictionary of
+        page name to rank, leaving out pages ranked 0. Ranks for a single
+        seed are the underestimates `local_push` gives.
+
+        `teleport` is a page, an iterable of pages to jump to uniformly,
+        or a dictionary of page to weight to jump to them in proportion.
+        """
+        key = _seed_set(teleport)
+        ranks = self.results.get(key)
+        if ranks is not None:
+            self.hits += 1
+            self.results.move_to_end(key)
+            return ranks
+        self.misses += 1
+
+        if len(key) == 1:
+            [(page, _)] = key
+            found = local_push(self.graph, self.damping_factor,
+                               self.graph.index[page], self.push_tolerance)
+            ranks = {self.graph.pages[p]: rank for p, rank in found.items()}
+        else:
+            found = power_iteration(
+                self.graph, self.damping_factor, self.tolerance,
+                MAX_ITERATIONS, _distribution(self.graph, key)
+            )
+            ranks = {
+                page: rank for page, rank in zip(self.graph.pages, found)
+                if rank
+            }
+
+        self.results[key] = ranks
+        if len(self.results) > self.cache_size:
+            self.results.popitem(last=False)
+        return ranks
+
+
+def teleport_distribution(graph, teleport):
+    """
+    Returns `teleport` (as taken by PersonalizedPageRank.ranks) as a list
+    of probabilities indexed like `graph.pages`.
+    """
+    return _distribution(graph, _seed_set(teleport))
+
+
+def _distribution(graph, seeds):
+    if not seeds:
+        raise ValueError("teleport distribution has no pages")
+    distribution = [0.0] * len(graph)
+    for page, probability in seeds:
+        distribution[graph.index[page]] = probability
+    return distribution
+
+
+def _seed_set(teleport):
+    """
+    Returns a frozenset of (page, probability) pairs describing `teleport`.
+    """
+    if isinstance(teleport, str):
+        teleport = [teleport]
+    if not isinstance(teleport, dict):
+        teleport = dict.fromkeys(teleport, 1)
+    total = sum(teleport.values())
+    if not total:
+        return frozenset()
+    return frozenset(
+        (page, weight / total) for page, weight in teleport.items() if weight
+    )
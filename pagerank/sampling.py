@@ -0,0 +1,95 @@
+import multiprocessing
+import random
+
+# Independent random surfers advanced side by side by default
+WALKERS = 1
+
+# Fewest samples each surfer draws; fewer surfers are used to ensure it
+MIN_WALK = 100
+
+
+def sample_counts(graph, damping_factor, n, walkers=WALKERS, rng=random):
+    """
+    Returns how many of `n` samples landed on each page of a LinkGraph,
+    as a list indexed like `graph.pages`.
+
+    `walkers` random surfers start on pages chosen uniformly at random
+    and take turns stepping, so each draws about n / walkers samples.
+    Each start counts as a sample but is not a step of the chain, so
+    no more surfers are used than leaves each at least MIN_WALK samples.
+    A step never builds a distribution: with probability
+    `damping_factor` the surfer follows one of the page's links picked
+    uniformly, otherwise (or if the page has no links) it jumps to a
+    page picked uniformly from the whole corpus. That is the same
+    distribution transition_model describes, in O(1) per sample.
+    """
+    size = len(graph)
+    counts = [0] * size
+    if not size or n <= 0:
+        return counts
+
+    offsets = graph.out_offsets.tolist()
+    targets = graph.out_targets.tolist()
+    degrees = [offsets[p + 1] - offsets[p] for p in range(size)]
+    draw = rng.random
+
+    walkers = max(1, min(walkers, n // MIN_WALK))
+    positions = [int(draw() * size) for _ in range(walkers)]
+    for page in positions:
+        counts[page] += 1
+    remaining = n - len(positions)
+
+    while remaining > 0:
+        for walker in range(min(len(positions), remaining)):
+            page = positions[walker]
+            degree = degrees[page]
+            if degree and draw() < damping_factor:
+                page = targets[offsets[page] + int(draw() * degree)]
+            else:
+                page = int(draw() * size)
+            positions[walker] = page
+            counts[page] += 1
+        remaining -= len(positions)
+    return counts
+
+
+def parallel_sample_counts(graph, damping_factor, n, walkers=WALKERS,
+                           seed=None, processes=None):
+    """
+    Returns sample counts like `sample_counts`, with the `n` samples
+    split evenly across `processes` worker processes (one per core if
+    None) and the counts merged.
+
+    Worker k draws from its own generator seeded with "<seed>/<k>", so
+    for a given seed and number of processes the result is the same
+    on every run.
+    """
+    processes = processes or multiprocessing.cpu_count()
+    if seed is None:
+        seed = random.randrange(2 ** 63)
+    chunks = [
+        (damping_factor, n // processes + (k < n % processes), walkers,
+         f"{seed}/{k}")
+        for k in range(processes)
+    ]
+    with multiprocessing.Pool(
+        processes, initializer=_set_graph, initargs=(graph,)
+    ) as pool:
+        results = pool.map(_sample_chunk, chunks, chunksize=1)
+    return [sum(counts) for counts in zip(*results)]
+
+
+# LinkGraph a sampling worker process draws from
+_graph = None
+
+
+def _set_graph(graph):
+    global _graph
+    _graph = graph
+
+
+def _sample_chunk(chunk):
+    damping_factor, n, walkers, seed = chunk
+    return sample_counts(
+        _graph, damping_factor, n, walkers, random.Random(seed)
+    )
@@ -0,0 +1,470 @@
+import array
+import collections
+import functools
+import itertools
+import operator
+import time
+
+# Default L1 distance between successive rank vectors that counts as converged
+TOLERANCE = 1e-8
+
+# Sweeps after which a solver gives up converging
+MAX_ITERATIONS = 1000
+
+# Sweeps between two extrapolations in power_iteration
+EXTRAPOLATE_EVERY = 10
+
+# Pages whose in-links block_iteration reads at a time
+BLOCK_SIZE = 1 << 16
+
+# Residual per link below which local_push leaves a page alone
+PUSH_TOLERANCE = 1e-5
+
+
+def power_iteration(graph, damping_factor, tolerance=TOLERANCE,
+                    max_iterations=MAX_ITERATIONS, teleport=None,
+                    extrapolation=None, callback=None):
+    """
+    Returns the PageRank of every page of a LinkGraph as a list indexed
+    like `graph.pages`.
+
+    Each sweep multiplies the rank vector by the column-stochastic link
+    matrix, pulling rank along in-links: page p receives
+        (1 - d) / N + d * (sum of PR(i) / NumLinks(i) over i linking to p
+                           + sum of PR(j) / N over pages j with no links)
+    A page with no links is treated as linking to every page, itself
+    included. Sweeps stop once the L1 change drops below `tolerance`.
+
+    With a `teleport` distribution (a list of probabilities indexed like
+    `graph.pages`), the surfer jumps, and leaves pages with no links,
+    according to it instead of to a page chosen uniformly, which gives
+    personalized PageRank.
+
+    `extrapolation` of "quadratic" replaces the ranks every
+    EXTRAPOLATE_EVERY sweeps with an estimate of their limit from the
+    last four sweeps (see `quadratic`). It is meant to remove the
+    slowest-decaying error when the damping factor is close to 1, but
+    on the corpora tried here it is barely ahead of plain power
+    iteration (98 against 106 sweeps at d = 0.99) and at times a sweep
+    behind. `callback`, if given, is called after every sweep as
+    described for `_report`.
+    """
+    size = len(graph)
+    if not size:
+        return []
+    inverse_degree = [
+        1 / graph.out_degree(p) if graph.out_degree(p) else 0.0
+        for p in range(size)
+    ]
+    dangling = graph.dangling()
+    in_offsets = graph.in_offsets
+    in_sources = graph.in_sources
+    extrapolate = {None: None, "quadratic": quadratic}[extrapolation]
+
+    started = time.perf_counter()
+    ranks = [1 / size] * size
+    history = collections.deque(maxlen=4)
+    for iteration in range(1, max_iterations + 1):
+        # What each page passes along every one of its links this sweep
+        share = [rank * inverse for rank, inverse in zip(ranks, inverse_degree)]
+        dangling_rank = sum(ranks[p] for p in dangling)
+        jump = 1 - damping_factor + damping_factor * dangling_rank
+
+        if teleport is None:
+            base = jump / size
+            updated = [
+                base + damping_factor * sum(map(
+                    share.__getitem__, in_sources[in_offsets[p]:in_offsets[p + 1]]
+                ))
+                for p in range(size)
+            ]
+        else:
+            updated = [
+                jump * teleport[p] + damping_factor * sum(map(
+                    share.__getitem__, in_sources[in_offsets[p]:in_offsets[p + 1]]
+                ))
+                for p in range(size)
+            ]
+
+        if extrapolate is not None:
+            history.append(updated)
+            if (iteration % EXTRAPOLATE_EVERY == 0
+                    and len(history) == history.maxlen):
+                updated = extrapolate(*history)
+                history.clear()
+        change = _report(callback, iteration, started, ranks, updated,
+                         tolerance)
+        ranks = updated
+        if change < tolerance:
+            break
+
+    # Correct for rounding so the ranks sum to exactly 1
+    total = sum(ranks)
+    return [rank / total for rank in ranks]
+
+
+def jacobi(graph, damping_factor, tolerance=TOLERANCE,
+           max_iterations=MAX_ITERATIONS, callback=None):
+    """
+    Returns the PageRank of every page of a LinkGraph as a list indexed
+    like `graph.pages`, by Jacobi iteration on the linear system
+        PR(p) = (1 - d) / N + d * sum of PR(i) / NumLinks(i) over i linking to p
+
+    Pages with no links simply lose their rank here instead of spreading
+    it evenly; since that spreading only scales every rank by the same
+    amount, normalizing the solution gives the same PageRank. Sweeps are
+    power iteration's minus the dangling sum, and stop once the L1
+    change, relative to the ranks' total, drops below `tolerance`.
+    """
+    size = len(graph)
+    if not size:
+        return []
+    inverse_degree = [
+        1 / graph.out_degree(p) if graph.out_degree(p) else 0.0
+        for p in range(size)
+    ]
+    in_offsets = graph.in_offsets
+    in_sources = graph.in_sources
+    base = (1 - damping_factor) / size
+
+    started = time.perf_counter()
+    ranks = [1 / size] * size
+    for iteration in range(1, max_iterations + 1):
+        share = [rank * inverse for rank, inverse in zip(ranks, inverse_degree)]
+        updated = [
+            base + damping_factor * sum(map(
+                share.__getitem__, in_sources[in_offsets[p]:in_offsets[p + 1]]
+            ))
+            for p in range(size)
+        ]
+        change = _report(callback, iteration, started, ranks, updated,
+                         tolerance, sum(updated))
+        ranks = updated
+        if change < tolerance:
+            break
+
+    total = sum(ranks)
+    return [rank / total for rank in ranks]
+
+
+def gauss_seidel(graph, damping_factor, tolerance=TOLERANCE,
+                 max_iterations=MAX_ITERATIONS, callback=None):
+    """
+    Returns the PageRank of every page of a LinkGraph as a list indexed
+    like `graph.pages`, by Gauss-Seidel iteration on the same linear
+    system as `jacobi`.
+
+    A sweep updates the pages in order, and each page already pulls
+    the new ranks of the pages updated before it in the same sweep,
+    which usually takes about half as many sweeps as Jacobi.
+    """
+    size = len(graph)
+    if not size:
+        return []
+    inverse_degree = [
+        1 / graph.out_degree(p) if graph.out_degree(p) else 0.0
+        for p in range(size)
+    ]
+    in_offsets = graph.in_offsets
+    in_sources = graph.in_sources
+    base = (1 - damping_factor) / size
+
+    started = time.perf_counter()
+    ranks = [1 / size] * size
+    share = [rank * inverse for rank, inverse in zip(ranks, inverse_degree)]
+    for iteration in range(1, max_iterations + 1):
+        previous = ranks[:]
+        for p in range(size):
+            rank = ranks[p] = base + damping_factor * sum(map(
+                share.__getitem__, in_sources[in_offsets[p]:in_offsets[p + 1]]
+            ))
+            share[p] = rank * inverse_degree[p]
+        change = _report(callback, iteration, started, previous, ranks,
+                         tolerance, sum(ranks))
+        if change < tolerance:
+            break
+
+    total = sum(ranks)
+    return [rank / total for rank in ranks]
+
+
+def quadratic(x0, x1, x2, x3):
+    """
+    Returns the quadratic extrapolation (Kamvar et al.) of four
+    successive rank vectors: it assumes they are a combination of the
+    PageRank vector and the next two eigenvectors of the link matrix,
+    fits those away by least squares and returns what is left.
+    """
+    y1 = [b - a for a, b in zip(x0, x1)]
+    y2 = [b - a for a, b in zip(x0, x2)]
+    y3 = [b - a for a, b in zip(x0, x3)]
+
+    # Solve [y1 y2] (g1, g2) = -y3 by least squares via normal equations
+    a11 = sum(a * a for a in y1)
+    a12 = sum(a * b for a, b in zip(y1, y2))
+    a22 = sum(b * b for b in y2)
+    b1 = -sum(a * c for a, c in zip(y1, y3))
+    b2 = -sum(b * c for b, c in zip(y2, y3))
+    determinant = a11 * a22 - a12 * a12
+    if not determinant:
+        return x3
+    g1 = (b1 * a22 - b2 * a12) / determinant
+    g2 = (a11 * b2 - a12 * b1) / determinant
+    g3 = 1.0
+    beta0, beta1, beta2 = g1 + g2 + g3, g2 + g3, g3
+
+    extrapolated = [
+        max(0.0, beta0 * a + beta1 * b + beta2 * c)
+        for a, b, c in zip(x1, x2, x3)
+    ]
+    total = sum(extrapolated)
+    if not total:
+        return x3
+    return [x / total for x in extrapolated]
+
+
+def block_iteration(graph, damping_factor, tolerance=TOLERANCE,
+                    max_iterations=MAX_ITERATIONS, block_size=BLOCK_SIZE,
+                    callback=None):
+    """
+    Returns the PageRank of every page as an array indexed like
+    `graph.pages`, computed as power_iteration does but for a graph
+    whose links live on disk, such as a linkfile.LinkFile.
+
+    Each sweep reads the in-links of `block_size` pages at a time, so
+    only that stretch of the link arrays has to be paged in at once.
+    What stays resident is a few flat arrays of one number per page:
+    the ranks, their shares along each link and the new ranks.
+    `callback` is as for power_iteration.
+    """
+    size = len(graph)
+    if not size:
+        return array.array("d")
+    degrees = [graph.out_degree(p) for p in range(size)]
+    inverse_degree = array.array(
+        "d", (1 / degree if degree else 0.0 for degree in degrees)
+    )
+    dangling = bytes(not degree for degree in degrees)
+    del degrees
+    in_offsets = graph.in_offsets
+    in_sources = graph.in_sources
+
+    started = time.perf_counter()
+    ranks = array.array("d", [1 / size]) * size
+    for iteration in range(1, max_iterations + 1):
+        share = array.array("d", map(operator.mul, ranks, inverse_degree))
+        dangling_rank = sum(itertools.compress(ranks, dangling))
+        base = (1 - damping_factor) / size + damping_factor * dangling_rank / size
+
+        updated = array.array("d")
+        for start in range(0, size, block_size):
+            end = min(size, start + block_size)
+            offsets = in_offsets[start:end + 1]
+            first = offsets[0]
+            block = in_sources[first:offsets[-1]]
+            updated.extend(
+                base + damping_factor * sum(map(
+                    share.__getitem__,
+                    block[offsets[i] - first:offsets[i + 1] - first]
+                ))
+                for i in range(end - start)
+            )
+            del block
+        change = _report(callback, iteration, started, ranks, updated,
+                         tolerance)
+        ranks = updated
+        if change < tolerance:
+            break
+
+    # Correct for rounding so the ranks sum to exactly 1
+    total = sum(ranks)
+    return array.array("d", (rank / total for rank in ranks))
+
+
+def push(graph, damping_factor, initial, tolerance=TOLERANCE,
+         max_iterations=MAX_ITERATIONS, callback=None):
+    """
+    Returns the PageRank of every page of a LinkGraph as a list indexed
+    like `graph.pages`, starting from the rank vector `initial`.
+
+    Meant for warm starts after a small change to the graph. One sweep
+    works out how far each page is from satisfying the PageRank
+    equation (its residual), and from then on only pages with a large
+    residual are touched, in the style of Gauss-Southwell / push
+    solvers: a page absorbs its residual into its rank and pushes the
+    damped share of it onto the pages it links to. Pages are pushed in
+    waves, each taking every page above a threshold that halves from one
+    wave to the next, until the residuals add up to less than
+    `tolerance` times the ranks' total, the same relative L1 change
+    power iteration stops at.
+
+    A page with no links would push evenly onto every page. That is
+    left out, as is any uniform part of the starting residuals: adding
+    the same amount to every residual only scales the solution, as
+    teleporting does, and the ranks are normalized at the end. Gives up
+    after `max_iterations` sweeps' worth of pushes. If `initial` was so
+    far off that the ranks end up with a total of zero or less, or with
+    a negative rank, they are solved again by power_iteration instead.
+    `callback` is called after every wave, with the pages pushed in it
+    as those changing.
+    """
+    size = len(graph)
+    if not size:
+        return []
+    inverse_degree = [
+        1 / graph.out_degree(p) if graph.out_degree(p) else 0.0
+        for p in range(size)
+    ]
+    out_offsets = graph.out_offsets
+    out_targets = graph.out_targets
+    in_offsets = graph.in_offsets
+    in_sources = graph.in_sources
+    ranks = list(initial)
+
+    # One power iteration sweep, minus the ranks we have
+    share = [rank * inverse for rank, inverse in zip(ranks, inverse_degree)]
+    dangling_rank = sum(ranks[p] for p in graph.dangling())
+    base = (1 - damping_factor) / size + damping_factor * dangling_rank / size
+    residual = [
+        base - ranks[p] + damping_factor * sum(map(
+            share.__getitem__, in_sources[in_offsets[p]:in_offsets[p + 1]]
+        ))
+        for p in range(size)
+    ]
+
+    # Only the non-uniform part of the residuals needs pushing, so take
+    # off the constant that leaves the least behind: their median. What
+    # is left of `base` sets the scale of the solution, so a shift that
+    # would take away more than half of it is not worth the risk
+    middle = sorted(residual)[size // 2]
+    if middle > base / 2:
+        middle = 0.0
+    residual = [r - middle for r in residual]
+
+    # Push every page whose residual is above a threshold, in waves,
+    # and lower the threshold whenever a wave runs out
+    threshold = max(map(abs, residual)) / 2
+    pushes = max_iterations * size
+    started = time.perf_counter()
+    wave = 0
+    while (pushes > 0 and
+           sum(map(abs, residual)) >= tolerance * abs(sum(ranks))):
+        wave += 1
+        pushed = pushes
+        queue = collections.deque(
+            p for p in range(size) if abs(residual[p]) > threshold
+        )
+        queued = bytearray(size)
+        for p in queue:
+            queued[p] = 1
+        append = queue.append
+        popleft = queue.popleft
+        while queue and pushes > 0:
+            p = popleft()
+            queued[p] = 0
+            amount = residual[p]
+            residual[p] = 0.0
+            ranks[p] += amount
+            pushes -= 1
+            amount *= damping_factor * inverse_degree[p]
+            for q in out_targets[out_offsets[p]:out_offsets[p + 1]]:
+                new = residual[q] = residual[q] + amount
+                if (new > threshold or new < -threshold) and not queued[q]:
+                    append(q)
+                    queued[q] = 1
+        threshold /= 2
+        if callback is not None:
+            callback(_telemetry(wave, sum(map(abs, residual)), started,
+                                pushed - pushes))
+
+    # A start too far off can leave ranks no rescaling makes valid
+    total = sum(ranks)
+    if total <= 0 or min(ranks) < 0:
+        return power_iteration(graph, damping_factor, tolerance,
+                               max_iterations, callback=callback)
+
+    # Correct for rounding so the ranks sum to exactly 1
+    return [rank / total for rank in ranks]
+
+
+def local_push(graph, damping_factor, seed, tolerance=PUSH_TOLERANCE):
+    """
+    Returns an approximate personalized PageRank of the pages around
+    page index `seed`, for a surfer who always jumps back to `seed`, as
+    a dictionary of page index to rank leaving out pages ranked 0.
+
+    All of the rank starts out as residual on `seed`. A page whose
+    residual exceeds `tolerance` per link keeps 1 - d of it as rank and
+    pushes the rest evenly onto the pages it links to (onto `seed` if it
+    has none), as in Andersen, Chung and Lang's local push. Only pages
+    near `seed` ever get touched, so the cost does not depend on the
+    size of the graph. Every rank is an underestimate, and together
+    they fall short of 1 by the residual left over.
+    """
+    out_offsets = graph.out_offsets
+    out_targets = graph.out_targets
+    ranks = collections.defaultdict(float)
+    residual = collections.defaultdict(float)
+    residual[seed] = 1.0
+    queue = collections.deque([seed])
+    queued = {seed}
+    while queue:
+        p = queue.popleft()
+        queued.discard(p)
+        amount = residual.pop(p)
+        ranks[p] += (1 - damping_factor) * amount
+        start, end = out_offsets[p], out_offsets[p + 1]
+        if start == end:
+            targets = (seed,)
+            amount *= damping_factor
+        else:
+            targets = out_targets[start:end]
+            amount *= damping_factor / (end - start)
+        for q in targets:
+            residual[q] += amount
+            if q not in queued and residual[q] > tolerance * max(
+                    1, out_offsets[q + 1] - out_offsets[q]):
+                queue.append(q)
+                queued.add(q)
+    return dict(ranks)
+
+
+# Solvers iterate_pagerank can be asked for by name
+SOLVERS = {
+    "power": power_iteration,
+    "jacobi": jacobi,
+    "gauss-seidel": gauss_seidel,
+    "quadratic": functools.partial(power_iteration, extrapolation="quadratic")
+}
+
+
+def _report(callback, iteration, started, ranks, updated, tolerance,
+            scale=1.0):
+    """
+    Returns the L1 change from `ranks` to `updated` divided by `scale`
+    (their total, for solvers whose ranks do not sum to 1).
+
+    If `callback` is given, it is called with a dictionary describing
+    the sweep: its number, "iteration"; that change, "residual"; the
+    seconds since `started`, "elapsed_s"; and "changing", the number of
+    pages whose rank moved by more than their share of `tolerance`.
+    """
+    if callback is None:
+        return sum(map(abs, map(operator.sub, updated, ranks))) / scale
+    differences = [abs(new - old) / scale for new, old in zip(updated, ranks)]
+    change = sum(differences)
+    threshold = tolerance / len(differences)
+    callback(_telemetry(
+        iteration, change, started,
+        sum(1 for difference in differences if difference > threshold)
+    ))
+    return change
+
+
+def _telemetry(iteration, residual, started, changing):
+    return {
+        "iteration": iteration,
+        "residual": residual,
+        "elapsed_s": time.perf_counter() - started,
+        "changing": changing
+    }
@@ -0,0 +1,46 @@
+import random
+import unittest
+
+import pagerank
+
+
+def l1(ranks, other):
+    return sum(abs(ranks[page] - other[page]) for page in other)
+
+
+class WarmStartTest(unittest.TestCase):
+
+    def test_corpus_gaining_a_page(self):
+        corpus = {"0.html": {"1.html"}, "1.html": set()}
+        ranks = pagerank.iterate_pagerank(corpus, 0.5,
+                                          previous={"0.html": 1.0})
+        self.assertLess(l1(ranks, {"0.html": 0.4, "1.html": 0.6}), 1e-7)
+
+    def test_one_hot_previous_on_a_ring(self):
+        corpus = {str(i): {str((i + 1) % 4)} for i in range(4)}
+        previous = {"0": 1.0, "1": 0.0, "2": 0.0, "3": 0.0}
+        ranks = pagerank.iterate_pagerank(corpus, 0.85, previous=previous)
+        self.assertLess(l1(ranks, dict.fromkeys(corpus, 0.25)), 1e-7)
+
+    def test_matches_cold_start_from_any_previous(self):
+        rng = random.Random(0)
+        for _ in range(500):
+            size = rng.randrange(1, 8)
+            corpus = {
+                str(i): {str(rng.randrange(size))
+                         for _ in range(rng.randrange(4))} - {str(i)}
+                for i in range(size)
+            }
+            previous = {
+                str(i): rng.choice([0.0, 1.0, 5.0, rng.random()])
+                for i in range(size) if rng.random() < 0.8
+            }
+            damping_factor = rng.choice([0.1, 0.5, 0.85])
+            cold = pagerank.iterate_pagerank(corpus, damping_factor, 1e-12)
+            warm = pagerank.iterate_pagerank(corpus, damping_factor,
+                                             previous=previous)
+            self.assertLess(l1(warm, cold), 1e-6, (corpus, previous))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import collections
+import random
+
+# Full distributions a TransitionModel keeps materialized
+CACHE_SIZE = 64
+
+
+class TransitionModel():
+    """
+    The transition model of one corpus for one damping factor.
+
+    For each page only the pages it links to (as a tuple to draw from
+    and a frozenset to look up) and two probabilities are kept: that of
+    moving to a given page by following one of the links, and that of
+    landing on a given page by jumping at random. A page with no links
+    jumps with probability 1. Full distributions over the corpus are
+    built on demand, and the last `cache_size` of them kept.
+    """
+
+    def __init__(self, corpus, damping_factor, cache_size=CACHE_SIZE):
+        self.pages = tuple(corpus)
+        self.damping_factor = damping_factor
+        self.cache_size = cache_size
+        self.links = {}
+        self.link_sets = {}
+        self.probabilities = {}
+        for page, links in corpus.items():
+            self.links[page] = tuple(links)
+            self.link_sets[page] = frozenset(links)
+            self.probabilities[page] = link_probabilities(
+                len(corpus), len(links), damping_factor
+            )
+        self.distributions = collections.OrderedDict()
+
+    def probability(self, page, target):
+        """
+        Returns the probability of visiting `target` next from `page`,
+        in O(1).
+        """
+        follow, jump = self.probabilities[page]
+        if follow and target in self.link_sets[page]:
+            return jump + follow
+        return jump
+
+    def distribution(self, page):
+        """
+        Returns the dictionary transition_model would for `page`. It is
+        shared with later calls, so must not be modified.
+        """
+        distribution = self.distributions.get(page)
+        if distribution is not None:
+            self.distributions.move_to_end(page)
+            return distribution
+
+        distribution = materialize(
+            self.pages, self.link_sets[page], *self.probabilities[page]
+        )
+        self.distributions[page] = distribution
+        if len(self.distributions) > self.cache_size:
+            self.distributions.popitem(last=False)
+        return distribution
+
+    def next_page(self, page, rng=random):
+        """
+        Returns a page drawn from the distribution for `page`, in O(1).
+        """
+        links = self.links[page]
+        if links and rng.random() < self.damping_factor:
+            return rng.choice(links)
+        return rng.choice(self.pages)
+
+
+def link_probabilities(size, num_links, damping_factor):
+    """
+    Returns (follow, jump): the probability of a page with `num_links`
+    links moving to each page it links to by following a link, and to
+    each of the `size` pages by jumping.
+    """
+    # Page has no outgoing links
+    if not num_links:
+        return 0.0, 1 / size
+    return damping_factor / num_links, (1 - damping_factor) / size
+
+
+def materialize(pages, links, follow, jump):
+    """
+    Returns the distribution over `pages` of a page linking to `links`.
+    """
+    if not follow:
+        return dict.fromkeys(pages, jump)
+    linked = jump + follow
+    return {page: linked if page in links else jump for page in pages}